@@ -7,27 +7,479 @@ A comprehensive tool for managing hierarchical bills of materials with cost trac
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
-from datetime import datetime
 import csv
+import functools
+import gzip
 import json
-from decimal import Decimal
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from operator import itemgetter
+from urllib.request import pathname2url
+
+log = logging.getLogger(__name__)
+
+
+# Unit costs are stored as integer millionths of a currency unit so sums are
+# exact and sub-cent part prices survive
+COST_SCALE = 1000000
+# COST_SCALE as a REAL literal, for the SQL that converts to and from micros
+_SQL_COST_SCALE = repr(float(COST_SCALE))
+
+
+def to_micros(cost):
+    """Convert a unit cost to the integer form stored in the database"""
+    return None if cost is None else int(round(cost * COST_SCALE))
+
+
+# Columns shown in the BOM tree, picked out of get_product_bom rows
+_BOM_COMPONENT_FIELDS = ('entry_id', 'mfg_part_number', 'manufacturer', 'description',
+                         'quantity', 'reference_designators', 'distributor', 'unit_cost')
+_BOM_SUB_ASSEMBLY_FIELDS = ('sub_assembly_id', 'part_number', 'description',
+                            'quantity', 'reference_designators')
+# Likewise for the products list, from get_products_page rows
+_PRODUCT_ROW_FIELDS = ('product_id', 'part_number', 'description', 'revision',
+                       'created_date', 'modified_date')
+
+
+def row_fields_getter(rows, names):
+    """Build an itemgetter returning the named columns of sqlite3.Row results"""
+    # Names are resolved to positions once, from the first row; looking a
+    # Row up by name scans its column list on every access
+    if not rows:
+        return itemgetter(*names)
+    keys = rows[0].keys()
+    return itemgetter(*[keys.index(name) for name in names])
+
+
+def dict_factory(cursor, row):
+    """Row factory that builds plain dicts keyed by column name"""
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+# Optional import columns and the values used when a file leaves them out
+_CSV_OPTIONAL_COLUMNS = (
+    ('reference_designators', ''),
+    ('notes', ''),
+    ('distributor', None),
+    ('distributor_part_number', ''),
+    ('unit_cost', None),
+    ('minimum_order_qty', 1),
+    ('lead_time_days', None),
+    ('description', ''),
+    ('category', ''),
+    ('unit_of_measure', 'EA'),
+)
+
+
+# Invalid rows an import reports individually; the rest are only counted
+IMPORT_ERRORS_KEPT = 100
+
+# Imports from CSV files at least this large drop the tables' plain indexes
+# and build them again afterwards, which beats updating them row by row,
+# unless the tables already hold more rows than the file
+DEFER_INDEXES_MIN_BYTES = 1 << 20
+
+
+def iter_bom_csv_batches(filename, batch_size=500):
+    """Parse a BOM import CSV, yielding (rows for BOMDatabase.bulk_import_bom, errors, lines read) batches"""
+    # errors holds a (line number, message) pair for each invalid row
+    errors = []
+    parsed_rows = []
+    
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        
+        # Check for required columns
+        required_cols = ['mfg_part_number', 'manufacturer', 'quantity']
+        if not all(col in header for col in required_cols):
+            raise ValueError(
+                f"CSV must contain columns: {', '.join(required_cols)}\n"
+                f"Found: {', '.join(header)}")
+        
+        # Fields are read by position. Optional columns missing from the file
+        # are given positions past the end of each row, holding their defaults
+        column = {name: i for i, name in enumerate(header)}
+        width = len(header)
+        missing = [(name, default) for name, default in _CSV_OPTIONAL_COLUMNS
+                   if name not in column]
+        for offset, (name, _) in enumerate(missing):
+            column[name] = width + offset
+        defaults = [default for _, default in missing]
+        
+        # Every field a row needs is pulled out in one call and unpacked
+        row_fields = itemgetter(*(column[name] for name in (
+            'mfg_part_number', 'manufacturer', 'quantity', 'reference_designators', 'notes',
+            'distributor', 'distributor_part_number', 'unit_cost', 'minimum_order_qty',
+            'lead_time_days', 'description', 'category', 'unit_of_measure')))
+        
+        # Rows are handed on a batch at a time so writing can start early
+        for row in reader:
+            if not row:
+                continue
+            # Short rows read as None past their end and long rows are cut
+            # back to the header, as DictReader would treat them
+            if len(row) != width:
+                row = row[:width] + [None] * (width - len(row))
+            row += defaults
+            (mfg_part_number, manufacturer, quantity, ref_des, notes, distributor,
+             distributor_part_number, unit_cost, minimum_order_qty, lead_time_days,
+             description, category, unit_of_measure) = row_fields(row)
+            
+            # Skip empty rows
+            if not mfg_part_number or not manufacturer:
+                continue
+            
+            # Invalid rows are caught by plain checks, keeping exceptions off
+            # the per-row path; fields a short row lacks read as None
+            if None in (quantity, ref_des, notes, description, category, unit_of_measure):
+                errors.append((reader.line_num, "missing fields"))
+                continue
+            try:
+                quantity = float(quantity)
+            except ValueError as e:
+                errors.append((reader.line_num, str(e)))
+                continue
+            
+            # Distributor source if provided
+            source = None
+            if distributor and unit_cost:
+                try:
+                    source = (
+                        distributor.strip(),
+                        distributor_part_number.strip(),
+                        float(unit_cost),
+                        int(minimum_order_qty),
+                        int(lead_time_days) if lead_time_days else None
+                    )
+                except ValueError:
+                    pass  # Skip invalid cost data
+                except (AttributeError, TypeError) as e:
+                    # A short row ended before the source fields
+                    errors.append((reader.line_num, str(e)))
+                    continue
+            
+            component = (
+                mfg_part_number.strip(),
+                manufacturer.strip(),
+                description.strip(),
+                category.strip(),
+                unit_of_measure.strip(),
+                0,
+                ''
+            )
+            parsed_rows.append((component, source, quantity, ref_des.strip(), notes.strip()))
+            
+            if len(parsed_rows) >= batch_size:
+                yield parsed_rows, errors, reader.line_num
+                parsed_rows = []
+                errors = []
+        
+        if parsed_rows or errors:
+            yield parsed_rows, errors, reader.line_num
+
+
+@contextmanager
+def open_replacing(filename, **kwargs):
+    """Open a CSV export for writing through a temporary file that replaces filename on success"""
+    # A failed or interrupted export then never leaves a partial file
+    # behind, and the 1 MiB buffer keeps it to a handful of write() calls.
+    # A .gz filename is written gzip-compressed at level 1, which costs
+    # little CPU and shrinks a CSV several times over
+    tmp_filename = filename + '.tmp'
+    try:
+        if filename.endswith('.gz'):
+            f = gzip.open(tmp_filename, 'wt', compresslevel=1, newline='', **kwargs)
+        else:
+            f = open(tmp_filename, 'w', newline='', buffering=1 << 20, **kwargs)
+        with f:
+            yield f
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+
+# Save dialog choices for CSV exports; see open_replacing
+_EXPORT_FILETYPES = [("CSV files", "*.csv"), ("Compressed CSV files", "*.csv.gz"),
+                     ("All files", "*.*")]
+
+
+# Hot-path queries are kept as module-level constants so each call passes the
+# same SQL text and hits the connection's prepared statement cache
+_SQL_TOUCH_PRODUCT = """
+    UPDATE products SET modified_date = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+    WHERE product_id = ?
+"""
+
+# CSV import statements, each run once per import through executemany
+_SQL_BULK_ADD_COMPONENTS = """
+    INSERT OR IGNORE INTO components (mfg_part_number, manufacturer, description, category,
+                                      unit_of_measure, is_assembly, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_BULK_ADD_SOURCES = """
+    INSERT INTO component_sources (component_id, distributor, distributor_part_number,
+                                  unit_cost_micros, minimum_order_qty, lead_time_days,
+                                  last_updated)
+    VALUES (?, ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+    ON CONFLICT(component_id, distributor) DO UPDATE
+    SET distributor_part_number = excluded.distributor_part_number,
+        unit_cost_micros = excluded.unit_cost_micros,
+        minimum_order_qty = excluded.minimum_order_qty,
+        lead_time_days = excluded.lead_time_days,
+        last_updated = excluded.last_updated
+"""
+
+# bulk_add_components maps part numbers back to IDs this many at a time
+_COMPONENT_ID_CHUNK = 500
+_SQL_COMPONENT_IDS = f"""
+    SELECT component_id, mfg_part_number, manufacturer FROM components
+    WHERE mfg_part_number IN ({', '.join('?' * _COMPONENT_ID_CHUNK)})
+"""
+
+_SQL_BULK_ADD_BOM_ENTRIES = """
+    INSERT INTO bom_entries (product_id, component_id, quantity, reference_designators,
+                            do_not_populate, notes)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(product_id, component_id) DO NOTHING
+"""
+
+# Each component line looks up its cheapest source with a seek on
+# idx_cs_comp_cost (component_id, unit_cost_micros), so reading a BOM costs
+# O(lines) rather than grouping every source in the catalog first. Sources
+# without a cost sort last; ties go to the oldest source
+_SQL_CHEAPEST_SOURCE_ID = """(
+        SELECT source_id FROM component_sources
+        WHERE component_id = c.component_id
+        ORDER BY unit_cost_micros IS NULL, unit_cost_micros, source_id
+        LIMIT 1
+    )"""
+
+_SQL_CHEAPEST_COST = """(
+        SELECT MIN(unit_cost_micros) FROM component_sources
+        WHERE component_id = c.component_id
+    )"""
+
+# One row per component, showing the same cheapest source as its BOM lines
+_SQL_COMPONENTS_WITH_SOURCES = """
+    SELECT c.mfg_part_number, c.manufacturer, c.description, c.category,
+           cs.distributor, cs.unit_cost
+    FROM components c
+    LEFT JOIN component_sources_v cs ON cs.source_id = """ + _SQL_CHEAPEST_SOURCE_ID + """
+    ORDER BY c.mfg_part_number
+"""
+
+# The BOM and cost queries come in two fixed variants, with and without DNP
+# lines, so the excluding one hands SQLite a constant do_not_populate = 0
+# to seek idx_be_product (product_id, do_not_populate) on
+_DNP_FILTER = " AND be.do_not_populate = 0"
+
+_SQL_BOM_COMPONENTS_TEMPLATE = """
+    SELECT 
+        c.component_id,
+        be.entry_id,
+        c.mfg_part_number,
+        c.manufacturer,
+        c.description,
+        c.category,
+        c.unit_of_measure,
+        be.quantity,
+        be.reference_designators,
+        be.do_not_populate,
+        be.notes,
+        ch.distributor,
+        ch.distributor_part_number,
+        ch.unit_cost,
+        ch.minimum_order_qty,
+        ch.lead_time_days,
+        'component' as item_type
+    FROM bom_entries be
+    JOIN components c ON be.component_id = c.component_id
+    LEFT JOIN component_sources_v ch ON ch.source_id = """ + _SQL_CHEAPEST_SOURCE_ID + """
+    WHERE be.product_id = ?{dnp_filter}
+    ORDER BY be.reference_designators, c.mfg_part_number
+"""
+_SQL_BOM_COMPONENTS = _SQL_BOM_COMPONENTS_TEMPLATE.format(dnp_filter=_DNP_FILTER)
+_SQL_BOM_COMPONENTS_WITH_DNP = _SQL_BOM_COMPONENTS_TEMPLATE.format(dnp_filter="")
+
+_SQL_BOM_SUB_ASSEMBLIES = """
+    SELECT 
+        sa.sub_assembly_id,
+        p.part_number,
+        p.description,
+        sa.quantity,
+        sa.reference_designators,
+        sa.notes,
+        'sub_assembly' as item_type,
+        p.product_id
+    FROM sub_assemblies sa
+    JOIN products p ON sa.child_product_id = p.product_id
+    WHERE sa.parent_product_id = ?
+    ORDER BY sa.reference_designators, p.part_number
+"""
+
+_SQL_COST_COMPONENTS_TEMPLATE = """
+    SELECT mfg_part_number, manufacturer, quantity,
+           unit_cost_micros / """ + _SQL_COST_SCALE + """,
+           unit_cost_micros / """ + _SQL_COST_SCALE + """ * quantity * ?
+    FROM (
+        SELECT c.mfg_part_number, c.manufacturer, be.quantity, be.reference_designators,
+               """ + _SQL_CHEAPEST_COST + """ AS unit_cost_micros
+        FROM bom_entries be
+        JOIN components c ON be.component_id = c.component_id
+        WHERE be.product_id = ?{dnp_filter}
+    )
+    WHERE unit_cost_micros <> 0
+    ORDER BY reference_designators, mfg_part_number
+"""
+_SQL_COST_COMPONENTS = _SQL_COST_COMPONENTS_TEMPLATE.format(dnp_filter=_DNP_FILTER)
+_SQL_COST_COMPONENTS_WITH_DNP = _SQL_COST_COMPONENTS_TEMPLATE.format(dnp_filter="")
+
+_SQL_COST_SUB_ASSEMBLIES = """
+    SELECT p.product_id, p.part_number, p.description, sa.quantity
+    FROM sub_assemblies sa
+    JOIN products p ON sa.child_product_id = p.product_id
+    WHERE sa.parent_product_id = ?
+    ORDER BY sa.reference_designators, p.part_number
+"""
+
+# reach lists each product under the given one once (UNION, not UNION ALL),
+# however many paths lead to it. Rows are (0, product_id, NULL, cost of its
+# own component lines) and (1, parent_product_id, child_product_id, quantity)
+_SQL_SUB_ASSEMBLY_GRAPH = """
+    WITH RECURSIVE reach(product_id) AS (
+        SELECT ?
+        UNION
+        SELECT sa.child_product_id
+        FROM sub_assemblies sa
+        JOIN reach ON sa.parent_product_id = reach.product_id
+    )
+    SELECT 0, reach.product_id, NULL,
+           SUM(be.quantity * """ + _SQL_CHEAPEST_COST + """)
+    FROM reach
+    JOIN bom_entries be ON be.product_id = reach.product_id
+    JOIN components c ON c.component_id = be.component_id
+    WHERE ? OR be.do_not_populate = 0
+    GROUP BY reach.product_id
+    UNION ALL
+    SELECT 1, sa.parent_product_id, sa.child_product_id, sa.quantity
+    FROM reach
+    JOIN sub_assemblies sa ON sa.parent_product_id = reach.product_id
+"""
+
+# Whether the first product contains the second, directly or through other
+# sub-assemblies; a product counts as containing itself
+_SQL_CONTAINS_PRODUCT = """
+    WITH RECURSIVE reach(product_id) AS (
+        SELECT ?
+        UNION
+        SELECT sa.child_product_id
+        FROM sub_assemblies sa
+        JOIN reach ON sa.parent_product_id = reach.product_id
+    )
+    SELECT 1 FROM reach WHERE product_id = ? LIMIT 1
+"""
+
+# assy walks every path through the sub-assembly tree; totals sums the
+# multipliers per product first, so a sub-assembly shared by several parents
+# has its BOM lines joined and costed once rather than once per path. Each
+# path carries the products on it and never re-enters one, so a cycle left
+# in an older database ends the walk instead of recursing forever
+_SQL_FLATTENED_BOM = """
+    WITH RECURSIVE assy(product_id, mult, path) AS (
+        SELECT ?1, ?2, ',' || ?1 || ','
+        UNION ALL
+        SELECT sa.child_product_id, assy.mult * sa.quantity,
+               assy.path || sa.child_product_id || ','
+        FROM sub_assemblies sa
+        JOIN assy ON sa.parent_product_id = assy.product_id
+        WHERE instr(assy.path, ',' || sa.child_product_id || ',') = 0
+    ),
+    totals(product_id, mult) AS (
+        SELECT product_id, SUM(mult) FROM assy GROUP BY product_id
+    )
+    SELECT 
+        c.component_id,
+        c.mfg_part_number,
+        c.manufacturer,
+        c.description,
+        c.category,
+        c.unit_of_measure,
+        SUM(be.quantity * totals.mult) AS quantity,
+        cs.distributor,
+        cs.distributor_part_number,
+        cs.unit_cost,
+        MIN(be.do_not_populate) AS do_not_populate
+    FROM totals
+    JOIN bom_entries be ON be.product_id = totals.product_id
+    JOIN components c ON c.component_id = be.component_id
+    LEFT JOIN component_sources_v cs ON cs.source_id = """ + _SQL_CHEAPEST_SOURCE_ID + """
+    WHERE ? OR be.do_not_populate = 0
+    GROUP BY c.component_id
+    ORDER BY c.mfg_part_number, c.manufacturer
+"""
 
 
 class BOMDatabase:
     """Handles all database operations for the BOM system"""
     
-    def __init__(self, db_path="bom_database.db"):
+    def __init__(self, db_path="bom_database.db", fast=True, create_schema=True,
+                 read_only=False):
         self.db_path = db_path
+        self.fast = fast
+        self.read_only = read_only
         self.conn = None
         self.cursor = None
+        self._in_bulk = False
+        self._touched_products = set()
+        # Bumped whenever this connection adds a product or component, so
+        # callers caching those lists can tell they are out of date
+        self.products_version = 0
+        self.components_version = 0
+        # Bumped on every write through this connection, for results such as
+        # BOM costs that depend on several tables
+        self.data_version = 0
         self.connect()
-        self.create_tables()
+        if create_schema and not read_only:
+            self.create_tables()
+            # Refresh planner statistics if they are missing or stale; left to
+            # the schema-owning connection so reader threads never write
+            self.cursor.execute("PRAGMA optimize = 0x10002")
     
     def connect(self):
         """Establish database connection"""
-        self.conn = sqlite3.connect(self.db_path)
+        # Every insert is an upsert reading its row ID back with RETURNING,
+        # which older libraries reject with a bare syntax error mid-edit
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            raise RuntimeError(f"SQLite 3.35 or newer is required, found {sqlite3.sqlite_version}")
+        if self.read_only:
+            # mode=ro makes SQLite itself refuse writes on this connection
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, cached_statements=256)
+        else:
+            self.conn = sqlite3.connect(self.db_path, cached_statements=256)
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
+        self.cursor.execute("PRAGMA foreign_keys = ON")
+        
+        if self.fast:
+            if not self.read_only:
+                # WAL with synchronous=NORMAL only syncs at checkpoints rather than
+                # on every commit, and keeps readers from blocking the writer
+                self.cursor.execute("PRAGMA journal_mode = WAL")
+                self.cursor.execute("PRAGMA synchronous = NORMAL")
+            self.cursor.execute("PRAGMA cache_size = -65536")
+            self.cursor.execute("PRAGMA temp_store = MEMORY")
+            self.cursor.execute("PRAGMA mmap_size = 268435456")
     
     def create_tables(self):
         """Create database schema"""
@@ -38,8 +490,8 @@ class BOMDatabase:
                 part_number TEXT UNIQUE NOT NULL,
                 description TEXT,
                 revision TEXT,
-                created_date TEXT,
-                modified_date TEXT,
+                created_date TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
+                modified_date TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
                 notes TEXT
             )
         """)
@@ -66,10 +518,10 @@ class BOMDatabase:
                 component_id INTEGER,
                 distributor TEXT,
                 distributor_part_number TEXT,
-                unit_cost REAL,
+                unit_cost_micros INTEGER,
                 minimum_order_qty INTEGER DEFAULT 1,
                 lead_time_days INTEGER,
-                last_updated TEXT,
+                last_updated TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
                 FOREIGN KEY (component_id) REFERENCES components(component_id)
             )
         """)
@@ -103,19 +555,205 @@ class BOMDatabase:
             )
         """)
         
+        self._migrate_unit_cost_to_micros()
+        
+        # Read-side view exposing unit_cost in currency units
+        self.cursor.execute("""
+            CREATE VIEW IF NOT EXISTS component_sources_v AS
+            SELECT source_id, component_id, distributor, distributor_part_number,
+                   unit_cost_micros, unit_cost_micros / """ + _SQL_COST_SCALE + """ AS unit_cost,
+                   minimum_order_qty, lead_time_days, last_updated
+            FROM component_sources
+        """)
+        
+        # One source per component and distributor. Databases created before
+        # this was enforced may hold duplicates, so clear those out first
+        self.cursor.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_cs_comp_dist'
+        """)
+        if not self.cursor.fetchone():
+            self.cleanup_duplicate_sources()
+        self.cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_cs_comp_dist
+            ON component_sources(component_id, distributor)
+        """)
+        
+        # Likewise a component appears at most once on a product's BOM
+        self.cursor.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_be_unique'
+        """)
+        if not self.cursor.fetchone():
+            self.merge_duplicate_bom_entries()
+        self.cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_be_unique
+            ON bom_entries(product_id, component_id)
+        """)
+        self.cursor.execute("DROP INDEX IF EXISTS idx_be_prodcomp")
+        
+        # And a product is used at most once as a sub-assembly of each parent
+        self.cursor.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_sa_unique'
+        """)
+        if not self.cursor.fetchone():
+            self.merge_duplicate_sub_assemblies()
+        self.cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_sa_unique
+            ON sub_assemblies(parent_product_id, child_product_id)
+        """)
+        
+        # Editing an existing BOM line bumps its product's modified date in SQL
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_be_touch_update AFTER UPDATE ON bom_entries
+            BEGIN
+                UPDATE products
+                SET modified_date = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+                WHERE product_id = NEW.product_id;
+            END
+        """)
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_sa_touch_update AFTER UPDATE ON sub_assemblies
+            BEGIN
+                UPDATE products
+                SET modified_date = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+                WHERE product_id = NEW.parent_product_id;
+            END
+        """)
+        
+        # Indexes for the foreign-key lookups behind BOM reads and edits.
+        # components(mfg_part_number, manufacturer) is already indexed by its
+        # UNIQUE constraint, idx_cs_comp_cost also serves component_id alone,
+        # idx_be_unique covers (product_id, component_id) lookups and
+        # idx_sa_unique serves parent_product_id alone
+        for index_sql in (
+            "CREATE INDEX IF NOT EXISTS idx_cs_comp_cost ON component_sources(component_id, unit_cost_micros)",
+            "CREATE INDEX IF NOT EXISTS idx_be_product ON bom_entries(product_id, do_not_populate)",
+            "CREATE INDEX IF NOT EXISTS idx_sa_child ON sub_assemblies(child_product_id)",
+            "DROP INDEX IF EXISTS idx_sa_parent",
+            "DROP INDEX IF EXISTS idx_sa_parent_child",
+        ):
+            self.cursor.execute(index_sql)
+        
+        # Gather planner statistics the first time; afterwards PRAGMA optimize
+        # refreshes them as the tables grow
+        self.cursor.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'
+        """)
+        if not self.cursor.fetchone():
+            self.cursor.execute("ANALYZE")
+        
         self.conn.commit()
     
+    def _migrate_unit_cost_to_micros(self):
+        """Rebuild a component_sources table that still stores REAL unit_cost"""
+        self.cursor.execute("PRAGMA table_info(component_sources)")
+        if 'unit_cost' not in {row['name'] for row in self.cursor.fetchall()}:
+            return
+        
+        # The rebuild runs as one transaction, so an interrupted one leaves the
+        # old table in place to be migrated on the next open. Another instance
+        # may have migrated it while this one waited for the lock
+        self.cursor.execute("BEGIN IMMEDIATE")
+        self.cursor.execute("PRAGMA table_info(component_sources)")
+        if 'unit_cost' not in {row['name'] for row in self.cursor.fetchall()}:
+            self.conn.rollback()
+            return
+        
+        # A copy left behind by an interrupted rebuild from before it ran in
+        # one transaction is discarded and made again
+        self.cursor.execute("DROP TABLE IF EXISTS component_sources_new")
+        
+        # Indexes on the old table are dropped with it and recreated afterwards
+        self.cursor.execute("""
+            CREATE TABLE component_sources_new (
+                source_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                component_id INTEGER,
+                distributor TEXT,
+                distributor_part_number TEXT,
+                unit_cost_micros INTEGER,
+                minimum_order_qty INTEGER DEFAULT 1,
+                lead_time_days INTEGER,
+                last_updated TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
+                FOREIGN KEY (component_id) REFERENCES components(component_id)
+            )
+        """)
+        self.cursor.execute("""
+            INSERT INTO component_sources_new (source_id, component_id, distributor,
+                                               distributor_part_number, unit_cost_micros,
+                                               minimum_order_qty, lead_time_days, last_updated)
+            SELECT source_id, component_id, distributor, distributor_part_number,
+                   CAST(ROUND(unit_cost * """ + _SQL_COST_SCALE + """) AS INTEGER),
+                   minimum_order_qty, lead_time_days, last_updated
+            FROM component_sources
+        """)
+        self.cursor.execute("DROP TABLE component_sources")
+        self.cursor.execute("ALTER TABLE component_sources_new RENAME TO component_sources")
+        self.conn.commit()
+    
+    def _commit(self):
+        """Commit unless writes are being grouped by bulk()"""
+        self.data_version += 1
+        if not self._in_bulk:
+            self.conn.commit()
+    
+    def _end_unchanged(self):
+        """Close the transaction of a write that changed nothing, unless inside bulk()"""
+        # sqlite3 opens a transaction before any INSERT, even one that is
+        # skipped or fails; left open it would keep the write lock
+        if not self._in_bulk:
+            self.conn.rollback()
+    
+    def _touch_product(self, product_id):
+        """Bump a product's modified date, deferring it to the end of a bulk() block"""
+        if self._in_bulk:
+            self._touched_products.add(product_id)
+        else:
+            self.cursor.execute(_SQL_TOUCH_PRODUCT, (product_id,))
+    
+    @contextmanager
+    def _tuple_rows(self):
+        """Have the shared cursor return plain tuples for the duration of the block"""
+        saved = self.cursor.row_factory
+        self.cursor.row_factory = None
+        try:
+            yield self.cursor
+        finally:
+            self.cursor.row_factory = saved
+    
+    @contextmanager
+    def bulk(self):
+        """Run a block of writes as one transaction, committing once at the end"""
+        if self._in_bulk:
+            yield self
+            return
+        self.cursor.execute("BEGIN IMMEDIATE")
+        self._in_bulk = True
+        try:
+            yield self
+            if self._touched_products:
+                self.cursor.executemany(_SQL_TOUCH_PRODUCT,
+                                        [(pid,) for pid in self._touched_products])
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+        finally:
+            self._in_bulk = False
+            self._touched_products.clear()
+    
     def add_product(self, part_number, description="", revision="A", notes=""):
         """Create a new product"""
         try:
-            now = datetime.now().isoformat()
             self.cursor.execute("""
                 INSERT INTO products (part_number, description, revision, created_date, modified_date, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (part_number, description, revision, now, now, notes))
-            self.conn.commit()
+                VALUES (?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'),
+                        strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'), ?)
+            """, (part_number, description, revision, notes))
+            self._commit()
+            self.products_version += 1
             return self.cursor.lastrowid
         except sqlite3.IntegrityError:
+            self._end_unchanged()
             return None
     
     def get_product(self, part_number):
@@ -128,244 +766,537 @@ class BOMDatabase:
         self.cursor.execute("SELECT * FROM products ORDER BY part_number")
         return self.cursor.fetchall()
     
+    def get_products_page(self, after_part_number=None, limit=200):
+        """Get the next page of products after the given part number"""
+        # Keyset pagination walks the part_number index instead of re-scanning
+        # skipped rows the way OFFSET does
+        if after_part_number is None:
+            self.cursor.execute("SELECT * FROM products ORDER BY part_number LIMIT ?", (limit,))
+        else:
+            self.cursor.execute("""
+                SELECT * FROM products WHERE part_number > ?
+                ORDER BY part_number LIMIT ?
+            """, (after_part_number, limit))
+        return self.cursor.fetchall()
+    
     def add_component(self, mfg_part_number, manufacturer, description="", category="", 
                      unit_of_measure="EA", is_assembly=False, notes=""):
         """Add a component to the database"""
-        try:
-            self.cursor.execute("""
-                INSERT INTO components (mfg_part_number, manufacturer, description, category, 
-                                      unit_of_measure, is_assembly, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (mfg_part_number, manufacturer, description, category, unit_of_measure, 
-                  1 if is_assembly else 0, notes))
-            self.conn.commit()
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError:
-            # Component already exists, return its ID
-            self.cursor.execute("""
-                SELECT component_id FROM components 
-                WHERE mfg_part_number = ? AND manufacturer = ?
-            """, (mfg_part_number, manufacturer))
-            result = self.cursor.fetchone()
-            return result['component_id'] if result else None
+        # The no-op DO UPDATE makes RETURNING report the existing row's ID too
+        self.cursor.execute("""
+            INSERT INTO components (mfg_part_number, manufacturer, description, category, 
+                                  unit_of_measure, is_assembly, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(mfg_part_number, manufacturer)
+            DO UPDATE SET mfg_part_number = excluded.mfg_part_number
+            RETURNING component_id
+        """, (mfg_part_number, manufacturer, description, category, unit_of_measure, 
+              1 if is_assembly else 0, notes))
+        result = self.cursor.fetchone()
+        self._commit()
+        self.components_version += 1
+        return result['component_id'] if result else None
+    
+    def get_component_keys(self):
+        """Get the ID, part number and manufacturer of every component"""
+        self.cursor.execute("""
+            SELECT component_id, mfg_part_number, manufacturer FROM components
+            ORDER BY mfg_part_number
+        """)
+        return self.cursor.fetchall()
     
     def add_component_source(self, component_id, distributor, distributor_part_number,
                             unit_cost, minimum_order_qty=1, lead_time_days=None):
         """Add a source for a component"""
-        # Check if this source already exists
+        # Update the existing source for this distributor instead of creating a duplicate
         self.cursor.execute("""
-            SELECT source_id FROM component_sources 
-            WHERE component_id = ? AND distributor = ?
-        """, (component_id, distributor))
-        
-        existing = self.cursor.fetchone()
-        
-        if existing:
-            # Update existing source instead of creating duplicate
-            now = datetime.now().isoformat()
-            self.cursor.execute("""
-                UPDATE component_sources 
-                SET distributor_part_number = ?,
-                    unit_cost = ?,
-                    minimum_order_qty = ?,
-                    lead_time_days = ?,
-                    last_updated = ?
-                WHERE source_id = ?
-            """, (distributor_part_number, unit_cost, minimum_order_qty, 
-                  lead_time_days, now, existing['source_id']))
-            self.conn.commit()
-            return existing['source_id']
-        else:
-            # Create new source
-            now = datetime.now().isoformat()
-            self.cursor.execute("""
-                INSERT INTO component_sources (component_id, distributor, distributor_part_number,
-                                              unit_cost, minimum_order_qty, lead_time_days, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (component_id, distributor, distributor_part_number, unit_cost, 
-                  minimum_order_qty, lead_time_days, now))
-            self.conn.commit()
-            return self.cursor.lastrowid
+            INSERT INTO component_sources (component_id, distributor, distributor_part_number,
+                                          unit_cost_micros, minimum_order_qty, lead_time_days,
+                                          last_updated)
+            VALUES (?, ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+            ON CONFLICT(component_id, distributor) DO UPDATE
+            SET distributor_part_number = excluded.distributor_part_number,
+                unit_cost_micros = excluded.unit_cost_micros,
+                minimum_order_qty = excluded.minimum_order_qty,
+                lead_time_days = excluded.lead_time_days,
+                last_updated = excluded.last_updated
+            RETURNING source_id
+        """, (component_id, distributor, distributor_part_number, to_micros(unit_cost), 
+              minimum_order_qty, lead_time_days))
+        result = self.cursor.fetchone()
+        self._commit()
+        return result['source_id']
     
     def add_bom_entry(self, product_id, component_id, quantity, reference_designators="", 
                      do_not_populate=False, notes=""):
-        """Add a component to a product's BOM"""
+        """Add a component to a product's BOM, merging into an existing line for it"""
         self.cursor.execute("""
             INSERT INTO bom_entries (product_id, component_id, quantity, reference_designators,
                                     do_not_populate, notes)
             VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(product_id, component_id) DO UPDATE
+            SET quantity = bom_entries.quantity + excluded.quantity,
+                reference_designators = CASE
+                    WHEN IFNULL(excluded.reference_designators, '') = ''
+                        THEN bom_entries.reference_designators
+                    WHEN IFNULL(bom_entries.reference_designators, '') = ''
+                        THEN excluded.reference_designators
+                    ELSE bom_entries.reference_designators || ',' || excluded.reference_designators
+                END
+            RETURNING entry_id
         """, (product_id, component_id, quantity, reference_designators, 
               1 if do_not_populate else 0, notes))
-        self.conn.commit()
+        entry_id = self.cursor.fetchone()['entry_id']
         
         # Update product modified date
-        now = datetime.now().isoformat()
-        self.cursor.execute("UPDATE products SET modified_date = ? WHERE product_id = ?", 
-                          (now, product_id))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        self._touch_product(product_id)
+        self._commit()
+        return entry_id
+    
+    def add_bom_entry_if_new(self, product_id, component_id, quantity, reference_designators="",
+                             do_not_populate=False, notes=""):
+        """Add a component to a product's BOM, returning None if it is already there"""
+        self.cursor.execute("""
+            INSERT INTO bom_entries (product_id, component_id, quantity, reference_designators,
+                                    do_not_populate, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(product_id, component_id) DO NOTHING
+            RETURNING entry_id
+        """, (product_id, component_id, quantity, reference_designators,
+              1 if do_not_populate else 0, notes))
+        row = self.cursor.fetchone()
+        if row is None:
+            self._end_unchanged()
+            return None
+        
+        # Update product modified date
+        self._touch_product(product_id)
+        self._commit()
+        return row['entry_id']
     
     def add_sub_assembly(self, parent_product_id, child_product_id, quantity, 
                         reference_designators="", notes=""):
-        """Add a sub-assembly (another product) to a product's BOM"""
+        """Add a sub-assembly (another product) to a product's BOM, returning None if it is already there"""
+        if self.contains_product(child_product_id, parent_product_id):
+            raise ValueError("A product cannot contain itself, directly or through its sub-assemblies")
         self.cursor.execute("""
             INSERT INTO sub_assemblies (parent_product_id, child_product_id, quantity,
                                        reference_designators, notes)
             VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(parent_product_id, child_product_id) DO NOTHING
+            RETURNING sub_assembly_id
         """, (parent_product_id, child_product_id, quantity, reference_designators, notes))
-        self.conn.commit()
+        row = self.cursor.fetchone()
+        if row is None:
+            self._end_unchanged()
+            return None
         
         # Update parent product modified date
-        now = datetime.now().isoformat()
-        self.cursor.execute("UPDATE products SET modified_date = ? WHERE product_id = ?", 
-                          (now, parent_product_id))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        self._touch_product(parent_product_id)
+        self._commit()
+        return row['sub_assembly_id']
+    
+    def contains_product(self, product_id, other_product_id):
+        """Check whether a product includes another, at any depth of its sub-assemblies"""
+        self.cursor.execute(_SQL_CONTAINS_PRODUCT, (product_id, other_product_id))
+        return self.cursor.fetchone() is not None
+    
+    def bulk_add_components(self, rows):
+        """Add many components at once, returning {(mfg_part_number, manufacturer): component_id}"""
+        # rows are (mfg_part_number, manufacturer, description, category,
+        # unit_of_measure, is_assembly, notes); existing components are kept
+        self.cursor.executemany(_SQL_BULK_ADD_COMPONENTS, rows)
+        self._commit()
+        self.components_version += 1
+        
+        # executemany cannot return rows, so map the keys back to IDs in chunks
+        keys = {(row[0], row[1]) for row in rows}
+        part_numbers = sorted({key[0] for key in keys})
+        component_ids = {}
+        for i in range(0, len(part_numbers), _COMPONENT_ID_CHUNK):
+            chunk = part_numbers[i:i + _COMPONENT_ID_CHUNK]
+            # Short chunks repeat their last part number, so every lookup
+            # runs the same cached statement
+            chunk += chunk[-1:] * (_COMPONENT_ID_CHUNK - len(chunk))
+            self.cursor.execute(_SQL_COMPONENT_IDS, chunk)
+            for row in self.cursor.fetchall():
+                key = (row['mfg_part_number'], row['manufacturer'])
+                if key in keys:
+                    component_ids[key] = row['component_id']
+        return component_ids
+    
+    def bulk_add_sources(self, rows):
+        """Add or update many component sources at once"""
+        # rows are (component_id, distributor, distributor_part_number, unit_cost,
+        # minimum_order_qty, lead_time_days); the last row for a source wins
+        self.cursor.executemany(_SQL_BULK_ADD_SOURCES, [
+            (cid, dist, dpn, to_micros(cost), moq, lead)
+            for cid, dist, dpn, cost, moq, lead in rows
+        ])
+        self._commit()
+    
+    def bulk_add_bom_entries(self, product_id, rows):
+        """Add many components to a product's BOM, skipping ones already on it"""
+        # rows are (component_id, quantity, reference_designators, do_not_populate, notes);
+        # idx_be_unique drops components already on the BOM or repeated in rows
+        self.cursor.executemany(_SQL_BULK_ADD_BOM_ENTRIES, [
+            (product_id, component_id, quantity, reference_designators,
+             1 if do_not_populate else 0, notes)
+            for component_id, quantity, reference_designators, do_not_populate, notes in rows
+        ])
+        inserted_count = max(self.cursor.rowcount, 0)
+        
+        if inserted_count:
+            self._touch_product(product_id)
+        self._commit()
+        return inserted_count
+    
+    def get_components_with_sources(self):
+        """Get every component with its cheapest source, for the Components tab"""
+        # Plain (mfg_part_number, manufacturer, description, category,
+        # distributor, unit_cost) tuples, in the tab's column order
+        with self._tuple_rows() as cursor:
+            cursor.execute(_SQL_COMPONENTS_WITH_SOURCES)
+            return cursor.fetchall()
+    
+    def bulk_import_bom(self, product_id, rows):
+        """Import parsed BOM lines into a product in one transaction, returning the lines added"""
+        # rows are (component_row, source, quantity, reference_designators, notes):
+        # component_row as taken by bulk_add_components, source as taken by
+        # bulk_add_sources without the leading component_id, or None
+        with self.bulk():
+            component_ids = self.bulk_add_components([row[0] for row in rows])
+            self.bulk_add_sources([
+                (component_ids[component[:2]],) + source
+                for component, source, _, _, _ in rows if source
+            ])
+            # Components already in the BOM (or repeated in the rows) are skipped
+            return self.bulk_add_bom_entries(product_id, [
+                (component_ids[component[:2]], quantity, reference_designators, False, notes)
+                for component, _, quantity, reference_designators, notes in rows
+            ])
+    
+    def import_bom_csv(self, product_id, filename, batch_size=500, progress=None):
+        """Import a BOM CSV into a product in one transaction, returning (lines added, rows skipped, errors)"""
+        # errors lists the first IMPORT_ERRORS_KEPT invalid rows as (line, message);
+        # progress, if given, is called as progress(lines read, total lines) per batch
+        # A reader thread parses batches ahead while this thread writes them;
+        # the bounded queue keeps only a few batches in memory at once
+        batches = queue.Queue(maxsize=4)
+        stop = threading.Event()
+        
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def produce():
+            try:
+                for batch in iter_bom_csv_batches(filename, batch_size):
+                    if not put(batch):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+        
+        # Dropping and rebuilding the plain indexes only pays off when a
+        # large file brings at least as many rows as the tables already hold;
+        # into a big database, updating them in place is far less work
+        defer = os.path.getsize(filename) >= DEFER_INDEXES_MIN_BYTES
+        if defer or progress:
+            with open(filename, 'rb') as f:
+                total_lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+        if defer:
+            self.cursor.execute("""
+                SELECT MAX((SELECT COUNT(*) FROM bom_entries),
+                           (SELECT COUNT(*) FROM component_sources))
+            """)
+            defer = total_lines >= self.cursor.fetchone()[0]
+        reader = threading.Thread(target=produce, daemon=True)
+        reader.start()
+        imported_count = skipped_count = 0
+        errors = []
+        try:
+            # Every batch goes into the same transaction, so a failure part
+            # way through leaves the database untouched
+            with self._sync_off():
+                with self.bulk(), self._indexes_deferred(defer, 'component_sources', 'bom_entries'):
+                    while True:
+                        batch = batches.get()
+                        if batch is None:
+                            break
+                        if isinstance(batch, Exception):
+                            raise batch
+                        rows, batch_errors, lines_read = batch
+                        added = self.bulk_import_bom(product_id, rows)
+                        imported_count += added
+                        skipped_count += len(batch_errors) + len(rows) - added
+                        errors.extend(batch_errors[:IMPORT_ERRORS_KEPT - len(errors)])
+                        if progress:
+                            progress(lines_read, max(total_lines, lines_read))
+        finally:
+            stop.set()
+            reader.join()
+        
+        # A large import re-analyzes the tables it filled; otherwise PRAGMA
+        # optimize refreshes statistics only for tables that have gone stale
+        if defer:
+            self.analyze('components', 'component_sources', 'bom_entries')
+        else:
+            self.cursor.execute("PRAGMA optimize")
+        return imported_count, skipped_count, errors
+    
+    @contextmanager
+    def _sync_off(self):
+        """Skip fsyncs for the block on fast connections, syncing once when it succeeds"""
+        # In WAL mode a crash inside the block can lose its writes but not
+        # corrupt the file
+        if not self.fast:
+            yield
+            return
+        self.cursor.execute("PRAGMA synchronous")
+        synchronous = self.cursor.fetchone()[0]
+        self.cursor.execute("PRAGMA synchronous = OFF")
+        try:
+            yield
+        finally:
+            self.cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        # The block's durability boundary: a checkpoint under the restored
+        # setting syncs the log, and with it everything the block committed
+        self.cursor.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    
+    @contextmanager
+    def _indexes_deferred(self, defer, *tables):
+        """Drop the tables' non-unique indexes for the block and recreate them after it"""
+        # Unique indexes stay, as the import's ON CONFLICT clauses rely on
+        # them. Run inside bulk(): if the block fails, rolling back the
+        # transaction restores the dropped indexes
+        if not defer:
+            yield
+            return
+        self.cursor.execute(f"""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%'
+              AND tbl_name IN ({', '.join('?' * len(tables))})
+        """, tables)
+        indexes = self.cursor.fetchall()
+        for name, _ in indexes:
+            self.cursor.execute(f'DROP INDEX "{name}"')
+        yield
+        for _, index_sql in indexes:
+            self.cursor.execute(index_sql)
+    
+    def change_token(self):
+        """Get a value that differs after any commit to the database, from any connection"""
+        # PRAGMA data_version moves only for other connections' commits, and
+        # data_version counts this connection's own writes
+        self.cursor.execute("PRAGMA data_version")
+        return self.data_version, self.cursor.fetchone()[0]
+    
+    def mark_changed(self):
+        """Note writes made through another connection so version-keyed caches refresh"""
+        self.products_version += 1
+        self.components_version += 1
+        self.data_version += 1
     
     def get_product_bom(self, product_id, include_dnp=False):
         """Get the complete BOM for a product including sub-assemblies"""
         # Get direct components
-        dnp_filter = "" if include_dnp else "AND be.do_not_populate = 0"
-        self.cursor.execute(f"""
-            SELECT 
-                c.component_id,
-                be.entry_id,
-                c.mfg_part_number,
-                c.manufacturer,
-                c.description,
-                c.category,
-                c.unit_of_measure,
-                be.quantity,
-                be.reference_designators,
-                be.do_not_populate,
-                be.notes,
-                (SELECT distributor FROM component_sources 
-                 WHERE component_id = c.component_id 
-                 ORDER BY unit_cost ASC LIMIT 1) as distributor,
-                (SELECT distributor_part_number FROM component_sources 
-                 WHERE component_id = c.component_id 
-                 ORDER BY unit_cost ASC LIMIT 1) as distributor_part_number,
-                (SELECT unit_cost FROM component_sources 
-                 WHERE component_id = c.component_id 
-                 ORDER BY unit_cost ASC LIMIT 1) as unit_cost,
-                (SELECT minimum_order_qty FROM component_sources 
-                 WHERE component_id = c.component_id 
-                 ORDER BY unit_cost ASC LIMIT 1) as minimum_order_qty,
-                (SELECT lead_time_days FROM component_sources 
-                 WHERE component_id = c.component_id 
-                 ORDER BY unit_cost ASC LIMIT 1) as lead_time_days,
-                'component' as item_type
-            FROM bom_entries be
-            JOIN components c ON be.component_id = c.component_id
-            WHERE be.product_id = ? {dnp_filter}
-            ORDER BY be.reference_designators, c.mfg_part_number
-        """, (product_id,))
+        self.cursor.execute(_SQL_BOM_COMPONENTS_WITH_DNP if include_dnp else _SQL_BOM_COMPONENTS,
+                            (product_id,))
         components = self.cursor.fetchall()
         
         # Get sub-assemblies
-        self.cursor.execute("""
-            SELECT 
-                sa.sub_assembly_id,
-                p.part_number,
-                p.description,
-                sa.quantity,
-                sa.reference_designators,
-                sa.notes,
-                'sub_assembly' as item_type,
-                p.product_id
-            FROM sub_assemblies sa
-            JOIN products p ON sa.child_product_id = p.product_id
-            WHERE sa.parent_product_id = ?
-            ORDER BY sa.reference_designators, p.part_number
-        """, (product_id,))
+        self.cursor.execute(_SQL_BOM_SUB_ASSEMBLIES, (product_id,))
         sub_assemblies = self.cursor.fetchall()
         
         return components, sub_assemblies
     
+    def get_bom_export_cursor(self, product_id):
+        """Query a product's BOM in CSV export layout, returning a tuple cursor to stream"""
+        # Columns are named after the CSV header; NULLIF keeps zero values
+        # blank in the export, as they were when rows were written one by one
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        cursor.execute("""
+            WITH lines AS (
+                SELECT 0 AS grp, 'component' AS item_type, c.mfg_part_number, c.manufacturer,
+                       c.description, c.category, be.quantity, be.reference_designators,
+                       ch.distributor, ch.distributor_part_number, ch.unit_cost,
+                       ch.minimum_order_qty, ch.lead_time_days, be.notes
+                FROM bom_entries be
+                JOIN components c ON be.component_id = c.component_id
+                LEFT JOIN component_sources_v ch ON ch.source_id = """ + _SQL_CHEAPEST_SOURCE_ID + """
+                WHERE be.product_id = ? AND be.do_not_populate = 0
+                UNION ALL
+                SELECT 1, 'sub_assembly', p.part_number, 'SUB-ASSEMBLY',
+                       p.description, 'Assembly', sa.quantity, sa.reference_designators,
+                       NULL, NULL, NULL, NULL, NULL, sa.notes
+                FROM sub_assemblies sa
+                JOIN products p ON sa.child_product_id = p.product_id
+                WHERE sa.parent_product_id = ?
+            )
+            SELECT item_type, mfg_part_number, manufacturer, description, category,
+                   quantity, reference_designators, distributor, distributor_part_number,
+                   NULLIF(unit_cost, 0) AS unit_cost,
+                   NULLIF(minimum_order_qty, 0) AS minimum_order_qty,
+                   NULLIF(lead_time_days, 0) AS lead_time_days, notes
+            FROM lines
+            ORDER BY grp, reference_designators, mfg_part_number
+        """, (product_id, product_id))
+        return cursor
+    
     def calculate_bom_cost(self, product_id, quantity=1, include_dnp=False):
         """Calculate the total cost of a BOM"""
-        components, sub_assemblies = self.get_product_bom(product_id, include_dnp)
-        
-        total_cost = 0.0
-        component_costs = []
-        
-        # Calculate component costs
-        for comp in components:
-            if comp['unit_cost']:
-                comp_total = float(comp['unit_cost']) * float(comp['quantity']) * quantity
-                total_cost += comp_total
-                component_costs.append({
-                    'item': f"{comp['mfg_part_number']} ({comp['manufacturer']})",
-                    'quantity': comp['quantity'],
-                    'unit_cost': comp['unit_cost'],
-                    'total': comp_total
-                })
-        
-        # Calculate sub-assembly costs recursively
-        for sub in sub_assemblies:
-            sub_cost, sub_breakdown = self.calculate_bom_cost(sub['product_id'], 
-                                                   float(sub['quantity']) * quantity, 
-                                                   include_dnp)
-            total_cost += sub_cost
+        # Only the costing columns are needed here, read as plain tuples.
+        # Line totals are multiplied out in SQL, in the same order as before
+        with self._tuple_rows() as cursor:
+            cursor.execute(_SQL_COST_COMPONENTS_WITH_DNP if include_dnp else _SQL_COST_COMPONENTS,
+                           (quantity, product_id))
+            components = cursor.fetchall()
             
-            # Calculate per-unit cost (handle zero quantity gracefully)
-            if float(sub['quantity']) * quantity > 0:
-                unit_cost = sub_cost / (float(sub['quantity']) * quantity)
-            else:
-                unit_cost = 0.0
+            cursor.execute(_SQL_COST_SUB_ASSEMBLIES, (product_id,))
+            sub_assemblies = cursor.fetchall()
+        
+        # Component costs
+        component_costs = [
+            {'item': f"{mfg_part_number} ({manufacturer})", 'quantity': comp_qty,
+             'unit_cost': unit_cost, 'total': comp_total}
+            for mfg_part_number, manufacturer, comp_qty, unit_cost, comp_total in components
+        ]
+        total_cost = sum((line[-1] for line in components), 0.0)
+        
+        # Sub-assembly costs are rolled up in SQL, once per child product
+        unit_costs = self.get_sub_assembly_unit_costs(product_id, include_dnp)
+        
+        for child_id, part_number, description, sub_qty in sub_assemblies:
+            unit_cost = unit_costs.get(child_id, 0.0)
+            sub_cost = unit_cost * sub_qty * quantity
+            total_cost += sub_cost
             
             component_costs.append({
-                'item': f"[SUB-ASSEMBLY] {sub['part_number']} - {sub['description']}",
-                'quantity': sub['quantity'],
+                'item': f"[SUB-ASSEMBLY] {part_number} - {description}",
+                'quantity': sub_qty,
                 'unit_cost': unit_cost,
                 'total': sub_cost
             })
         
         return total_cost, component_costs
     
+    def get_sub_assembly_unit_costs(self, product_id, include_dnp=False):
+        """Get the rolled-up cost of one unit of each direct sub-assembly of a product"""
+        with self._tuple_rows() as cursor:
+            cursor.execute(_SQL_SUB_ASSEMBLY_GRAPH, (product_id, 1 if include_dnp else 0))
+            rows = cursor.fetchall()
+        
+        own_costs = {}
+        children = {}
+        for kind, parent_id, child_id, value in rows:
+            if kind == 0:
+                own_costs[parent_id] = value or 0
+            else:
+                children.setdefault(parent_id, []).append((child_id, value))
+        
+        # Unit costs are rolled up children first, each product once, so a
+        # sub-assembly shared by many others (or reached along many paths)
+        # is costed a single time. A product already being costed further
+        # up the stack is a cycle and contributes nothing
+        unit_costs = {}
+        in_progress = set()
+        for child_id, _ in children.get(product_id, ()):
+            stack = [child_id]
+            while stack:
+                node = stack[-1]
+                if node in unit_costs:
+                    stack.pop()
+                    continue
+                in_progress.add(node)
+                pending = [child for child, _ in children.get(node, ())
+                           if child not in unit_costs and child not in in_progress]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                in_progress.discard(node)
+                unit_costs[node] = own_costs.get(node, 0) + sum(
+                    quantity * unit_costs.get(child, 0)
+                    for child, quantity in children.get(node, ()))
+        
+        return {child_id: unit_costs[child_id] / COST_SCALE
+                for child_id, _ in children.get(product_id, ())}
+    
+    def get_flattened_bom_cte(self, product_id, quantity=1, include_dnp=False, cursor=None):
+        """Flatten a BOM across all sub-assemblies with a single recursive query"""
+        cursor = cursor or self.cursor
+        # assy walks the sub-assembly tree, carrying the accumulated quantity
+        # multiplier; components are then summed per component in SQL
+        cursor.execute(_SQL_FLATTENED_BOM, (product_id, quantity, 1 if include_dnp else 0))
+        return cursor.fetchall()
+    
     def get_flattened_bom(self, product_id, quantity=1, include_dnp=False):
         """Get a flattened BOM with all components from all sub-assemblies"""
-        flattened = {}
-        
-        def flatten_recursive(prod_id, qty):
-            components, sub_assemblies = self.get_product_bom(prod_id, include_dnp)
-            
-            # Add components
-            for comp in components:
-                key = f"{comp['mfg_part_number']}|{comp['manufacturer']}"
-                if key in flattened:
-                    flattened[key]['quantity'] += float(comp['quantity']) * qty
-                else:
-                    flattened[key] = {
-                        'mfg_part_number': comp['mfg_part_number'],
-                        'manufacturer': comp['manufacturer'],
-                        'description': comp['description'],
-                        'category': comp['category'],
-                        'unit_of_measure': comp['unit_of_measure'],
-                        'quantity': float(comp['quantity']) * qty,
-                        'distributor': comp['distributor'],
-                        'distributor_part_number': comp['distributor_part_number'],
-                        'unit_cost': comp['unit_cost'],
-                        'do_not_populate': comp['do_not_populate']
-                    }
-            
-            # Recursively flatten sub-assemblies
-            for sub in sub_assemblies:
-                flatten_recursive(sub['product_id'], float(sub['quantity']) * qty)
+        # Aggregation happens in SQL; rows come back as dicts directly
+        cursor = self.conn.cursor()
+        cursor.row_factory = dict_factory
+        return self.get_flattened_bom_cte(product_id, quantity, include_dnp, cursor)
+    
+    def write_flattened_bom_csv(self, product_id, quantity, filename):
+        """Write a flattened BOM with line costs to a CSV file"""
+        # Rows are unpacked positionally from a plain tuple cursor and
+        # streamed to the writer as they are read
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(_SQL_FLATTENED_BOM, (product_id, quantity, 0))
+        
+        def export_rows(cursor):
+            for (_, mpn, mfg, desc, category, _, qty, distributor, distributor_pn,
+                 unit_cost, _) in cursor:
+                yield (
+                    mpn,
+                    mfg,
+                    desc,
+                    category,
+                    qty,
+                    unit_cost or '',
+                    f"{unit_cost * qty:.2f}" if unit_cost else '',
+                    distributor or '',
+                    distributor_pn or ''
+                )
+        
+        with open_replacing(filename, encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Mfg Part Number', 'Manufacturer', 'Description', 'Category',
+                           'Total Quantity', 'Unit Cost', 'Total Cost', 'Distributor',
+                           'Distributor Part Number'])
+            writer.writerows(export_rows(cursor))
+        return filename
+    
+    def write_bom_csv(self, product_id, filename):
+        """Write a product's BOM to a CSV file in the import layout"""
+        cursor = self.get_bom_export_cursor(product_id)
         
-        flatten_recursive(product_id, quantity)
-        return list(flattened.values())
+        with open_replacing(filename, encoding='utf-8') as f:
+            writer = csv.writer(f)
+            # Header matches import format plus item_type to distinguish sub-assemblies;
+            # rows stream straight from the cursor without being materialized
+            writer.writerow([column[0] for column in cursor.description])
+            writer.writerows(cursor)
+        return filename
     
     def delete_bom_entry(self, entry_id):
         """Delete a BOM entry (component from a product)"""
         self.cursor.execute("DELETE FROM bom_entries WHERE entry_id = ?", (entry_id,))
-        self.conn.commit()
+        self._commit()
         return self.cursor.rowcount > 0
     
     def delete_sub_assembly_entry(self, sub_assembly_id):
         """Delete a sub-assembly entry (product from another product)"""
         self.cursor.execute("DELETE FROM sub_assemblies WHERE sub_assembly_id = ?", (sub_assembly_id,))
-        self.conn.commit()
+        self._commit()
         return self.cursor.rowcount > 0
     
     def delete_entire_bom(self, product_id):
@@ -378,7 +1309,7 @@ class BOMDatabase:
         self.cursor.execute("DELETE FROM sub_assemblies WHERE parent_product_id = ?", (product_id,))
         subs_deleted = self.cursor.rowcount
         
-        self.conn.commit()
+        self._commit()
         return components_deleted + subs_deleted
     
     def get_bom_entry_id(self, product_id, component_id):
@@ -401,49 +1332,399 @@ class BOMDatabase:
     
     def cleanup_duplicate_sources(self):
         """Remove duplicate component sources, keeping the most recent one"""
-        # Find duplicates (same component_id + distributor)
+        # Rank sources within each component + distributor pair, newest first,
+        # and delete everything after the first
         self.cursor.execute("""
-            SELECT component_id, distributor, COUNT(*) as count
-            FROM component_sources
-            GROUP BY component_id, distributor
-            HAVING count > 1
+            DELETE FROM component_sources
+            WHERE source_id IN (
+                SELECT source_id FROM (
+                    SELECT source_id,
+                           ROW_NUMBER() OVER (PARTITION BY component_id, distributor
+                                              ORDER BY last_updated DESC) AS rn
+                    FROM component_sources
+                )
+                WHERE rn > 1
+            )
         """)
-        duplicates = self.cursor.fetchall()
-        
-        removed_count = 0
-        for dup in duplicates:
-            # Keep the most recent one, delete the rest
-            self.cursor.execute("""
-                SELECT source_id FROM component_sources
-                WHERE component_id = ? AND distributor = ?
-                ORDER BY last_updated DESC
-            """, (dup['component_id'], dup['distributor']))
-            
-            all_sources = self.cursor.fetchall()
-            # Keep first (most recent), delete others
-            for source in all_sources[1:]:
-                self.cursor.execute("DELETE FROM component_sources WHERE source_id = ?", 
-                                  (source['source_id'],))
-                removed_count += 1
-        
-        self.conn.commit()
+        removed_count = self.cursor.rowcount
+        self._commit()
         return removed_count
     
+    def merge_duplicate_bom_entries(self):
+        """Fold repeated BOM lines for the same component into the earliest one"""
+        # The surviving line takes the summed quantity and every line's
+        # reference designators; the others are then deleted
+        self.cursor.execute("""
+            UPDATE bom_entries
+            SET quantity = (
+                    SELECT SUM(d.quantity) FROM bom_entries d
+                    WHERE d.product_id = bom_entries.product_id
+                      AND d.component_id = bom_entries.component_id
+                ),
+                reference_designators = IFNULL((
+                    SELECT GROUP_CONCAT(d.reference_designators) FROM bom_entries d
+                    WHERE d.product_id = bom_entries.product_id
+                      AND d.component_id = bom_entries.component_id
+                      AND d.reference_designators <> ''
+                ), '')
+            WHERE entry_id IN (
+                SELECT MIN(entry_id) FROM bom_entries
+                GROUP BY product_id, component_id
+                HAVING COUNT(*) > 1
+            )
+        """)
+        self.cursor.execute("""
+            DELETE FROM bom_entries
+            WHERE entry_id NOT IN (
+                SELECT MIN(entry_id) FROM bom_entries
+                GROUP BY product_id, component_id
+            )
+        """)
+        merged_count = self.cursor.rowcount
+        self._commit()
+        return merged_count
+    
+    def merge_duplicate_sub_assemblies(self):
+        """Fold repeated uses of a sub-assembly under the same parent into the earliest one"""
+        self.cursor.execute("""
+            UPDATE sub_assemblies
+            SET quantity = (
+                    SELECT SUM(d.quantity) FROM sub_assemblies d
+                    WHERE d.parent_product_id = sub_assemblies.parent_product_id
+                      AND d.child_product_id = sub_assemblies.child_product_id
+                ),
+                reference_designators = IFNULL((
+                    SELECT GROUP_CONCAT(d.reference_designators) FROM sub_assemblies d
+                    WHERE d.parent_product_id = sub_assemblies.parent_product_id
+                      AND d.child_product_id = sub_assemblies.child_product_id
+                      AND d.reference_designators <> ''
+                ), '')
+            WHERE sub_assembly_id IN (
+                SELECT MIN(sub_assembly_id) FROM sub_assemblies
+                GROUP BY parent_product_id, child_product_id
+                HAVING COUNT(*) > 1
+            )
+        """)
+        self.cursor.execute("""
+            DELETE FROM sub_assemblies
+            WHERE sub_assembly_id NOT IN (
+                SELECT MIN(sub_assembly_id) FROM sub_assemblies
+                GROUP BY parent_product_id, child_product_id
+            )
+        """)
+        merged_count = self.cursor.rowcount
+        self._commit()
+        return merged_count
+    
+    def analyze(self, *tables):
+        """Rebuild the query planner's statistics after a large change, for all tables by default"""
+        if not tables:
+            self.cursor.execute("ANALYZE")
+        for table in tables:
+            self.cursor.execute(f'ANALYZE "{table}"')
+        self._commit()
+    
     def close(self):
         """Close database connection"""
         if self.conn:
+            if not self.read_only:
+                self.cursor.execute("PRAGMA optimize")
             self.conn.close()
+            self.conn = None
+
+
+class DatabaseWorker:
+    """Runs database reads on background threads and hands results back to Tk"""
+    
+    def __init__(self, root, db_path, fast=True, readers=2, poll_ms=20, on_busy=None):
+        self.root = root
+        self.db_path = db_path
+        self.fast = fast
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._posted = queue.Queue()
+        self._latest = {}
+        self._pending = 0
+        self._poll_id = None
+        
+        # Each reader thread opens its own read-only connection; WAL lets them
+        # read alongside the GUI thread's writes
+        self._threads = [threading.Thread(target=self._serve, daemon=True)
+                         for _ in range(readers)]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, key, callback, func, *args, errback=None):
+        """Run func(db, *args) on a worker connection, then callback(result) on the Tk thread"""
+        # Only the newest request per key is delivered, so a slow result
+        # never overwrites the display of a later selection
+        generation = self._latest.get(key, 0) + 1
+        self._latest[key] = generation
+        self._pending += 1
+        if self._pending == 1 and self.on_busy:
+            self.on_busy(True)
+        self._tasks.put((key, generation, (callback, errback), func, args))
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+    
+    def post(self, callback, *args):
+        """From a worker thread, run callback(*args) on the Tk thread at the next poll"""
+        # Calls are only delivered while a submitted task is still pending
+        self._posted.put((callback, args))
+    
+    def cancel(self, key):
+        """Drop the result of any request still pending for key"""
+        self._latest[key] = self._latest.get(key, 0) + 1
+    
+    def _serve(self):
+        """Worker thread loop: execute tasks against this thread's connection"""
+        db = BOMDatabase(self.db_path, self.fast, create_schema=False, read_only=True)
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    self._tasks.task_done()
+                    break
+                key, generation, callback, func, args = task
+                try:
+                    result, error = func(db, *args), None
+                except Exception as e:
+                    result, error = None, e
+                self._results.put((key, generation, callback, result, error))
+                self._tasks.task_done()
+        finally:
+            db.close()
+    
+    def _poll(self):
+        """Deliver finished results on the Tk thread"""
+        self._poll_id = None
+        while True:
+            try:
+                callback, args = self._posted.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        while True:
+            try:
+                key, generation, (callback, errback), result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if generation != self._latest.get(key):
+                continue
+            if error is None:
+                callback(result)
+            elif errback is not None:
+                errback(error)
+            else:
+                messagebox.showerror("Error", str(error))
+        
+        if self._pending:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+        elif self.on_busy:
+            self.on_busy(False)
+    
+    def close(self):
+        """Stop the worker threads once queued tasks are done"""
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+@contextmanager
+def batch_tree_updates(tree):
+    """Detach a Treeview from its scrollbar and geometry manager during bulk inserts"""
+    # Tk then lays the tree out and reports its scroll position once, when
+    # it is packed again, instead of tracking every inserted row
+    yscrollcommand = tree.cget('yscrollcommand')
+    tree.configure(yscrollcommand='')
+    pack_info = tree.pack_info() if tree.winfo_manager() == 'pack' else None
+    if pack_info is not None:
+        # Re-pack ahead of the same sibling so the layout order is kept
+        slaves = tree.master.pack_slaves()
+        following = slaves[slaves.index(tree) + 1:]
+        if following:
+            pack_info['before'] = following[0]
+        tree.pack_forget()
+    try:
+        yield tree
+    finally:
+        if pack_info is not None:
+            tree.pack(**pack_info)
+        tree.configure(yscrollcommand=yscrollcommand)
+
+
+class PagedTreeview:
+    """Holds every row for a Treeview but only inserts a window around the viewport"""
+    
+    def __init__(self, tree, scrollbar, page_size=100, format_row=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.format_row = format_row
+        self._rows = []
+        self._formatted = {}
+        self._offset = 0
+        self._count = 0
+        self._sliding = False
+        
+        # The tree reports its view of the window and the scrollbar drives
+        # it; both are translated against the full row list
+        tree.configure(yscrollcommand=self._on_scroll)
+        scrollbar.configure(command=self._on_scrollbar)
+    
+    def set_rows(self, rows, keep_position=False):
+        """Replace the contents with rows, a list of (iid, values, tags) tuples"""
+        # With format_row, rows may be raw items that are turned into
+        # format_row(index, item) tuples only as they are inserted. Formatted
+        # rows are kept while the same list is shown, including when it is
+        # passed in again. keep_position refills the window at the current
+        # offset, for a reload of the same list after an edit
+        if rows is not self._rows:
+            self._formatted = {}
+        self._rows = rows
+        offset, top = 0, None
+        if keep_position and self._count:
+            top = self._offset + float(self.tree.yview()[0]) * self._count
+            offset = min(self._offset, max(0, len(rows) - 2 * self.page_size))
+        self._show(offset)
+        if top is not None and self._count:
+            self.tree.yview_moveto((top - offset) / self._count)
+    
+    def _show(self, offset):
+        """Insert the window of rows starting at offset in place of the current one"""
+        self._offset = offset
+        window = self._rows[offset:offset + 2 * self.page_size]
+        self._count = len(window)
+        if self.format_row:
+            format_row = self.format_row
+            formatted = self._formatted
+            rows = []
+            for index, item in enumerate(window, offset):
+                row = formatted.get(index)
+                if row is None:
+                    row = formatted[index] = format_row(index, item)
+                rows.append(row)
+            window = rows
+        
+        # Deleting the rows drops the selection and focus, so both are put
+        # back afterwards for the rows that are still shown
+        selection = self.tree.selection()
+        focus = self.tree.focus()
+        with batch_tree_updates(self.tree):
+            children = self.tree.get_children()
+            if children:
+                self.tree.delete(*children)
+            # Inserted last row first at index 0: Tk finds 'end' by walking
+            # the children list, while the front of the list is at hand
+            insert = self.tree.insert
+            for iid, values, tags in reversed(window):
+                insert('', 0, iid=iid, values=values, tags=tags)
+            if selection or focus:
+                shown = {str(iid) for iid, _, _ in window}
+                kept = [iid for iid in selection if iid in shown]
+                if kept:
+                    self.tree.selection_set(kept)
+                if focus in shown:
+                    self.tree.focus(focus)
+    
+    def _clamp_offset(self, top):
+        """Window offset that puts row index top half a page below the window start"""
+        last_offset = max(0, len(self._rows) - 2 * self.page_size)
+        return max(0, min(int(top) - self.page_size // 2, last_offset))
+    
+    def _on_scroll(self, first, last):
+        """Set the scrollbar from the tree's view, sliding the window near its edges"""
+        first, last = float(first), float(last)
+        total = len(self._rows)
+        if self._count == total:
+            self.scrollbar.set(first, last)
+            return
+        
+        top = self._offset + first * self._count
+        bottom = self._offset + last * self._count
+        self.scrollbar.set(top / total, bottom / total)
+        
+        margin = self.page_size / 2
+        if ((self._offset > 0 and top - self._offset < margin) or
+                (self._offset + self._count < total and
+                 self._offset + self._count - bottom < margin)):
+            if not self._sliding:
+                # Deferred so the tree is not modified from inside its own callback
+                self._sliding = True
+                self.tree.after_idle(self._slide)
+    
+    def _slide(self):
+        """Move the window to centre on the tree's current view"""
+        self._sliding = False
+        if self._count == len(self._rows):
+            return
+        top = self._offset + float(self.tree.yview()[0]) * self._count
+        offset = self._clamp_offset(top)
+        if offset != self._offset:
+            self._show(offset)
+            self.tree.yview_moveto((top - offset) / self._count)
+    
+    def _on_scrollbar(self, *args):
+        """Jump the window to wherever the scrollbar is dragged in the full list"""
+        if args[0] == 'moveto' and self._count < len(self._rows):
+            top = float(args[1]) * len(self._rows)
+            offset = self._clamp_offset(top)
+            if offset != self._offset:
+                self._show(offset)
+            self.tree.yview_moveto((top - offset) / self._count)
+        else:
+            self.tree.yview(*args)
 
 
 class BOMManagerGUI:
     """Main GUI application for BOM management"""
     
+    # Products are loaded into the Products tab a page at a time
+    PRODUCT_PAGE_SIZE = 200
+    
+    # Seconds the product list behind the comboboxes is reused before it is
+    # re-read, to pick up products added from another instance
+    PRODUCTS_CACHE_TTL = 10
+    
+    # Milliseconds a BOM product selection must settle before it is loaded
+    BOM_SELECT_DELAY_MS = 200
+    
     def __init__(self, root):
         self.root = root
         self.root.title("BOM Manager - Bill of Materials System")
         self.root.geometry("1200x800")
         
         self.db = BOMDatabase()
+        self.db_worker = DatabaseWorker(self.root, self.db.db_path, self.db.fast,
+                                        on_busy=self._set_busy)
+        self._products_cache = None
+        self._products_cache_time = 0.0
+        self._products_cache_version = None
+        self._product_choices_cache = ()
+        self._product_ids_cache = ()
+        self._products_by_id = {}
+        self._component_index_cache = {}
+        self._component_choices_cache = ()
+        self._component_ids_cache = ()
+        self._component_cache_version = None
+        
+        # Product/component ids parallel to each combobox's values
+        self._bom_product_ids = ()
+        self._bom_component_ids = ()
+        self._cost_product_ids = ()
+        self._cost_breakdown = []
+        self._query_cache = {}
+        self._query_cache_version = None
+        self._load_bom_after_id = None
+        self._bom_shown_product_id = None
+        self._imports_running = 0
+        self._import_dialog = None
+        self._import_product_ids = ()
+        self._import_choice = None
         
         self.setup_ui()
         
@@ -468,6 +1749,9 @@ class BOMManagerGUI:
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
+        # Shown below the tabs while the database worker is busy
+        self.busy_bar = ttk.Progressbar(self.root, mode='indeterminate', length=200)
+        
         # Tab 1: Products
         self.products_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.products_tab, text="Products")
@@ -488,6 +1772,26 @@ class BOMManagerGUI:
         self.notebook.add(self.cost_tab, text="Cost Analysis")
         self.setup_cost_tab()
     
+    def _configure_tree(self, tree, columns, width):
+        """Set a treeview's columns and headings and hide its tree column"""
+        tree.configure(columns=columns)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=width)
+        tree.column('#0', width=0, stretch=tk.NO)
+    
+    def _set_busy(self, busy):
+        """Show or hide the activity bar for background database work"""
+        if busy:
+            # An import may have left the bar showing its progress
+            self.busy_bar.configure(mode='indeterminate', value=0)
+            self.busy_bar.pack(side=tk.BOTTOM, anchor=tk.E, padx=5, pady=(0, 5),
+                               before=self.notebook)
+            self.busy_bar.start(10)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+    
     def setup_products_tab(self):
         """Setup the products management tab"""
         # Top frame for adding new products
@@ -520,17 +1824,13 @@ class BOMManagerGUI:
         
         # Product treeview
         columns = ('Part Number', 'Description', 'Revision', 'Created', 'Modified')
-        self.product_tree = ttk.Treeview(bottom_frame, columns=columns, show='tree headings')
-        
-        for col in columns:
-            self.product_tree.heading(col, text=col)
-            self.product_tree.column(col, width=150)
-        
-        self.product_tree.column('#0', width=0, stretch=tk.NO)
+        self.product_tree = ttk.Treeview(bottom_frame, show='tree headings')
+        self._configure_tree(self.product_tree, columns, 150)
         
-        scrollbar = ttk.Scrollbar(bottom_frame, orient=tk.VERTICAL, 
-                                 command=self.product_tree.yview)
-        self.product_tree.configure(yscrollcommand=scrollbar.set)
+        self.product_scrollbar = ttk.Scrollbar(bottom_frame, orient=tk.VERTICAL, 
+                                               command=self.product_tree.yview)
+        self.product_tree.configure(yscrollcommand=self._on_products_scroll)
+        scrollbar = self.product_scrollbar
         
         self.product_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -588,17 +1888,13 @@ class BOMManagerGUI:
         # Component treeview
         columns = ('Mfg Part Number', 'Manufacturer', 'Description', 'Category', 
                   'Distributor', 'Unit Cost')
-        self.component_tree = ttk.Treeview(bottom_frame, columns=columns, show='tree headings')
-        
-        for col in columns:
-            self.component_tree.heading(col, text=col)
-            self.component_tree.column(col, width=150)
-        
-        self.component_tree.column('#0', width=0, stretch=tk.NO)
+        self.component_tree = ttk.Treeview(bottom_frame, show='tree headings')
+        self._configure_tree(self.component_tree, columns, 150)
         
         scrollbar = ttk.Scrollbar(bottom_frame, orient=tk.VERTICAL, 
                                  command=self.component_tree.yview)
-        self.component_tree.configure(yscrollcommand=scrollbar.set)
+        self.component_tree_pages = PagedTreeview(self.component_tree, scrollbar,
+                                                  format_row=self._component_row)
         
         self.component_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -619,7 +1915,7 @@ class BOMManagerGUI:
         self.bom_product_combo = ttk.Combobox(top_frame, textvariable=self.bom_product_var,
                                               width=50, state='readonly')
         self.bom_product_combo.pack(side=tk.LEFT, padx=5)
-        self.bom_product_combo.bind('<<ComboboxSelected>>', self.load_bom)
+        self.bom_product_combo.bind('<<ComboboxSelected>>', self._on_bom_product_selected)
         
         ttk.Button(top_frame, text="Refresh Products", 
                   command=self.refresh_bom_products).pack(side=tk.LEFT, padx=5)
@@ -679,17 +1975,12 @@ class BOMManagerGUI:
         # BOM treeview
         columns = ('Type', 'Part Number', 'Mfr/Product', 'Description', 'Qty', 
                   'Ref Des', 'Distributor', 'Cost')
-        self.bom_tree = ttk.Treeview(bottom_frame, columns=columns, show='tree headings')
-        
-        for col in columns:
-            self.bom_tree.heading(col, text=col)
-            self.bom_tree.column(col, width=120)
-        
-        self.bom_tree.column('#0', width=0, stretch=tk.NO)
+        self.bom_tree = ttk.Treeview(bottom_frame, show='tree headings')
+        self._configure_tree(self.bom_tree, columns, 120)
         
         scrollbar = ttk.Scrollbar(bottom_frame, orient=tk.VERTICAL, 
                                  command=self.bom_tree.yview)
-        self.bom_tree.configure(yscrollcommand=scrollbar.set)
+        self.bom_tree_pages = PagedTreeview(self.bom_tree, scrollbar)
         
         self.bom_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -745,17 +2036,14 @@ class BOMManagerGUI:
         
         # Detailed breakdown
         columns = ('Item', 'Quantity', 'Unit Cost', 'Total Cost')
-        self.cost_tree = ttk.Treeview(results_frame, columns=columns, show='tree headings')
-        
-        for col in columns:
-            self.cost_tree.heading(col, text=col)
-            self.cost_tree.column(col, width=200)
-        
-        self.cost_tree.column('#0', width=0, stretch=tk.NO)
+        self.cost_tree = ttk.Treeview(results_frame, show='tree headings')
+        self._configure_tree(self.cost_tree, columns, 200)
+        self.cost_tree.tag_configure('subassembly', background='#e8f4f8')
         
         scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, 
                                  command=self.cost_tree.yview)
-        self.cost_tree.configure(yscrollcommand=scrollbar.set)
+        self.cost_tree_pages = PagedTreeview(self.cost_tree, scrollbar,
+                                             format_row=self._cost_row)
         
         self.cost_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -772,6 +2060,9 @@ class BOMManagerGUI:
     
     def add_product(self):
         """Add a new product"""
+        if self._import_in_progress():
+            return
+        
         part_number = self.product_pn_entry.get().strip()
         description = self.product_desc_entry.get().strip()
         revision = self.product_rev_entry.get().strip()
@@ -796,6 +2087,9 @@ class BOMManagerGUI:
     
     def add_component(self):
         """Add a new component"""
+        if self._import_in_progress():
+            return
+        
         mpn = self.comp_mpn_entry.get().strip()
         mfg = self.comp_mfg_entry.get().strip()
         desc = self.comp_desc_entry.get().strip()
@@ -815,34 +2109,32 @@ class BOMManagerGUI:
             return
         
         # Check if component already exists
-        self.db.cursor.execute("""
-            SELECT component_id FROM components 
-            WHERE mfg_part_number = ? AND manufacturer = ?
-        """, (mpn, mfg))
-        existing_component = self.db.cursor.fetchone()
-        
-        component_id = self.db.add_component(mpn, mfg, desc, cat)
+        existing_component = (mpn, mfg) in self._component_index()
         
-        message = ""
-        if existing_component:
-            message = f"Component {mpn} already exists. "
-        else:
-            message = f"Component {mpn} added successfully. "
-        
-        if component_id and dist and cost is not None:
-            # Check if this distributor source already exists
-            self.db.cursor.execute("""
-                SELECT source_id FROM component_sources 
-                WHERE component_id = ? AND distributor = ?
-            """, (component_id, dist))
-            existing_source = self.db.cursor.fetchone()
+        # The component and its source are written in one transaction
+        with self.db.bulk():
+            component_id = self.db.add_component(mpn, mfg, desc, cat)
             
-            self.db.add_component_source(component_id, dist, dpn, cost)
-            
-            if existing_source:
-                message += f"Updated pricing from {dist}."
+            message = ""
+            if existing_component:
+                message = f"Component {mpn} already exists. "
             else:
-                message += f"Added distributor {dist}."
+                message = f"Component {mpn} added successfully. "
+            
+            if component_id and dist and cost is not None:
+                # Check if this distributor source already exists
+                self.db.cursor.execute("""
+                    SELECT source_id FROM component_sources 
+                    WHERE component_id = ? AND distributor = ?
+                """, (component_id, dist))
+                existing_source = self.db.cursor.fetchone()
+                
+                self.db.add_component_source(component_id, dist, dpn, cost)
+                
+                if existing_source:
+                    message += f"Updated pricing from {dist}."
+                else:
+                    message += f"Added distributor {dist}."
         
         messagebox.showinfo("Success", message)
         self.comp_mpn_entry.delete(0, tk.END)
@@ -856,64 +2148,176 @@ class BOMManagerGUI:
     
     def refresh_products(self):
         """Refresh the products list"""
-        for item in self.product_tree.get_children():
-            self.product_tree.delete(item)
+        children = self.product_tree.get_children()
+        if children:
+            self.product_tree.delete(*children)
+        
+        self._products_last_pn = None
+        self._products_exhausted = False
+        self._products_loading = False
+        self.load_more_products()
+    
+    def load_more_products(self):
+        """Append the next page of products to the products list"""
+        self._products_loading = False
+        if self._products_exhausted:
+            return
         
-        products = self.db.get_all_products()
+        products = self.db.get_products_page(self._products_last_pn, self.PRODUCT_PAGE_SIZE)
+        rows = []
+        append = rows.append
+        product_fields = row_fields_getter(products, _PRODUCT_ROW_FIELDS)
         for product in products:
-            self.product_tree.insert('', 'end', values=(
-                product['part_number'],
-                product['description'],
-                product['revision'],
-                product['created_date'][:10] if product['created_date'] else '',
-                product['modified_date'][:10] if product['modified_date'] else ''
-            ))
+            (product_id, part_number, desc, revision, created,
+             modified) = product_fields(product)
+            append((str(product_id), (
+                part_number,
+                desc,
+                revision,
+                created[:10] if created else '',
+                modified[:10] if modified else ''
+            )))
+        
+        with batch_tree_updates(self.product_tree):
+            for iid, values in rows:
+                self.product_tree.insert('', 'end', iid=iid, values=values)
+        
+        if products:
+            self._products_last_pn = products[-1]['part_number']
+        if len(products) < self.PRODUCT_PAGE_SIZE:
+            self._products_exhausted = True
+    
+    def _on_products_scroll(self, first, last):
+        """Keep the scrollbar in sync and load another page near the bottom"""
+        self.product_scrollbar.set(first, last)
+        if (float(last) >= 0.95 and not self._products_exhausted
+                and not self._products_loading):
+            # Deferred so the tree is not modified from inside its own callback
+            self._products_loading = True
+            self.root.after_idle(self.load_more_products)
     
     def refresh_components(self):
         """Refresh the components list"""
-        for item in self.component_tree.get_children():
-            self.component_tree.delete(item)
-        
-        self.db.cursor.execute("""
-            SELECT c.*, cs.distributor, cs.unit_cost
-            FROM components c
-            LEFT JOIN component_sources cs ON c.component_id = cs.component_id
-            ORDER BY c.mfg_part_number
-        """)
-        components = self.db.cursor.fetchall()
-        
-        for comp in components:
-            self.component_tree.insert('', 'end', values=(
-                comp['mfg_part_number'],
-                comp['manufacturer'],
-                comp['description'],
-                comp['category'],
-                comp['distributor'] or '',
-                f"${comp['unit_cost']:.2f}" if comp['unit_cost'] else ''
-            ))
+        self.db_worker.submit('components', self._show_components,
+                              BOMDatabase.get_components_with_sources)
+    
+    def _show_components(self, components):
+        """Fill the components list with rows fetched by the database worker"""
+        # Rows are formatted as they are paged in, so reloading a large
+        # catalog (after an import, say) only formats the rows on screen
+        self.component_tree_pages.set_rows(components)
+    
+    def _component_row(self, idx, component):
+        """Format one get_components_with_sources row as a component tree row"""
+        mpn, mfg, desc, category, distributor, unit_cost = component
+        return (str(idx), (
+            mpn,
+            mfg,
+            desc,
+            category,
+            distributor or '',
+            f"${unit_cost:.2f}" if unit_cost else ''
+        ), ())
+    
+    def _products(self):
+        """Get all products, reusing the last query while it is fresh"""
+        now = time.monotonic()
+        if (self._products_cache_version != self.db.products_version or
+                now - self._products_cache_time > self.PRODUCTS_CACHE_TTL):
+            self._products_cache = self.db.get_all_products()
+            # Tuples are handed to the comboboxes as-is and shared between them
+            self._product_choices_cache = tuple(f"{p['part_number']} - {p['description']}"
+                                                for p in self._products_cache)
+            self._product_ids_cache = tuple(p['product_id'] for p in self._products_cache)
+            self._products_by_id = {p['product_id']: p for p in self._products_cache}
+            self._products_cache_time = now
+            self._products_cache_version = self.db.products_version
+        return self._products_cache
+    
+    def _product_choices(self):
+        """Get the 'part number - description' strings shown in product comboboxes"""
+        self._products()
+        return self._product_choices_cache
+    
+    def _component_index(self):
+        """Get {(mfg_part_number, manufacturer): component_id}, rebuilt after components change"""
+        if self._component_cache_version != self.db.components_version:
+            components = self.db.get_component_keys()
+            self._component_index_cache = {
+                (c['mfg_part_number'], c['manufacturer']): c['component_id'] for c in components
+            }
+            self._component_choices_cache = tuple(f"{c['mfg_part_number']} ({c['manufacturer']})"
+                                                  for c in components)
+            self._component_ids_cache = tuple(c['component_id'] for c in components)
+            self._component_cache_version = self.db.components_version
+        return self._component_index_cache
+    
+    def _component_choices(self):
+        """Get the 'part number (manufacturer)' strings shown in the component combobox"""
+        self._component_index()
+        return self._component_choices_cache
+    
+    def _submit_cached(self, key, callback, func, *args):
+        """Like db_worker.submit, but reuse the result while the database is unchanged"""
+        # Results are kept per (key, args) and dropped wholesale on any commit
+        # to the database, including from imports and other instances, so
+        # repeated loads and cost requests skip the query
+        version = self.db.change_token()
+        if self._query_cache_version != version:
+            self._query_cache = {}
+            self._query_cache_version = version
+        cache_key = (key,) + args
+        result = self._query_cache.get(cache_key)
+        if result is not None:
+            self.db_worker.cancel(key)
+            callback(result)
+            return
+        
+        def store(result):
+            # Skip caching if a write landed while the query ran
+            if version == self._query_cache_version == self.db.change_token():
+                self._query_cache[cache_key] = result
+            callback(result)
+        
+        self.db_worker.submit(key, store, func, *args)
+    
+    def _selected_product(self, combo, product_ids):
+        """Get the product chosen in a combobox from its parallel list of ids"""
+        index = combo.current()
+        if index < 0:
+            return None
+        return self._products_by_id.get(product_ids[index])
     
     def refresh_bom_products(self):
         """Refresh product lists in BOM tab"""
-        products = self.db.get_all_products()
-        product_list = [f"{p['part_number']} - {p['description']}" for p in products]
+        product_list = self._product_choices()
         
         self.bom_product_combo['values'] = product_list
         self.bom_sub_combo['values'] = product_list
+        self._bom_product_ids = self._product_ids_cache
         
         # Refresh components
-        self.db.cursor.execute("SELECT * FROM components ORDER BY mfg_part_number")
-        components = self.db.cursor.fetchall()
-        component_list = [f"{c['mfg_part_number']} ({c['manufacturer']})" for c in components]
-        self.bom_comp_combo['values'] = component_list
+        self.bom_comp_combo['values'] = self._component_choices()
+        self._bom_component_ids = self._component_ids_cache
+    
+    def _on_bom_product_selected(self, event=None):
+        """Load the chosen product's BOM once the selection settles"""
+        # Arrowing through the list fires an event per product; only the
+        # last one within BOM_SELECT_DELAY_MS is loaded
+        if self._load_bom_after_id is not None:
+            self.root.after_cancel(self._load_bom_after_id)
+        self._load_bom_after_id = self.root.after(self.BOM_SELECT_DELAY_MS, self._load_selected_bom)
+    
+    def _load_selected_bom(self):
+        """Run a BOM load scheduled by _on_bom_product_selected"""
+        self._load_bom_after_id = None
+        self.load_bom()
     
     def load_bom(self, event=None):
         """Load BOM for selected product"""
-        selected = self.bom_product_var.get()
-        if not selected:
-            return
-        
-        part_number = selected.split(' - ')[0]
-        product = self.db.get_product(part_number)
+        # combo.current() answers both whether and what is selected, so the
+        # combobox variable is not read separately
+        product = self._selected_product(self.bom_product_combo, self._bom_product_ids)
         
         if not product:
             return
@@ -921,68 +2325,85 @@ class BOMManagerGUI:
         # Store current product_id for later use
         self.current_bom_product_id = product['product_id']
         
-        # Dictionary to store item metadata (maps tree item_id to database ID)
-        self.bom_item_metadata = {}
-        
-        # Clear existing items
-        for item in self.bom_tree.get_children():
-            self.bom_tree.delete(item)
-        
-        # Load BOM
-        components, sub_assemblies = self.db.get_product_bom(product['product_id'])
-        
-        # DEBUG: Print what we got
-        print(f"DEBUG: Loading BOM for product_id {product['product_id']}")
-        print(f"DEBUG: Found {len(components)} components")
-        print(f"DEBUG: Found {len(sub_assemblies)} sub-assemblies")
+        # Load BOM on the database worker; the tree is filled in when it's done
+        self._submit_cached('bom', self._show_bom,
+                            BOMDatabase.get_product_bom, product['product_id'])
+    
+    def _show_bom(self, bom):
+        """Fill the BOM tree with a product BOM fetched by the database worker"""
+        components, sub_assemblies = bom
+        
+        # Item ids encode the row's kind and database id ('c:<entry_id>' or
+        # 's:<sub_assembly_id>'), so they survive the paged tree re-inserting
+        # rows as it scrolls and delete_bom_item can decode them directly
+        rows = []
+        append = rows.append
+        
+        # Debug output is built only when debug logging is enabled; per-row
+        # messages are skipped entirely otherwise
+        debug = log.isEnabledFor(logging.DEBUG)
+        log.debug("Loading BOM for product_id %s", self.current_bom_product_id)
+        log.debug("Found %d components", len(components))
+        log.debug("Found %d sub-assemblies", len(sub_assemblies))
         
         # Add components - use entry_id from query results
+        component_fields = row_fields_getter(components, _BOM_COMPONENT_FIELDS)
         for idx, comp in enumerate(components):
             try:
-                print(f"DEBUG: Component {idx}: {comp['mfg_part_number']} - entry_id: {comp['entry_id']}")
-                
-                cost_str = f"${comp['unit_cost']:.2f}" if comp['unit_cost'] else ''
+                (entry_id, mpn, mfg, desc, qty, ref_des, distributor,
+                 unit_cost) = component_fields(comp)
+                if debug:
+                    log.debug("Component %d: %s - entry_id: %s", idx, mpn, entry_id)
                 
-                item_id = self.bom_tree.insert('', 'end', values=(
+                append((f"c:{entry_id}", (
                     'Component',
-                    comp['mfg_part_number'],
-                    comp['manufacturer'],
-                    comp['description'],
-                    comp['quantity'],
-                    comp['reference_designators'],
-                    comp['distributor'] or '',
-                    cost_str
-                ))
-                # Store metadata in dictionary
-                self.bom_item_metadata[item_id] = ('component', comp['entry_id'])
+                    mpn,
+                    mfg,
+                    desc,
+                    qty,
+                    ref_des,
+                    distributor or '',
+                    f"${unit_cost:.2f}" if unit_cost else ''
+                ), ()))
             except Exception as e:
-                print(f"ERROR loading component {idx}: {e}")
+                log.error("Error loading component %d: %s", idx, e)
                 raise
         
         # Add sub-assemblies - use sub_assembly_id from query results
+        sub_assembly_fields = row_fields_getter(sub_assemblies, _BOM_SUB_ASSEMBLY_FIELDS)
         for idx, sub in enumerate(sub_assemblies):
-            print(f"DEBUG: Sub-assembly {idx}: {sub['part_number']} - sub_assembly_id: {sub['sub_assembly_id']}")
-            item_id = self.bom_tree.insert('', 'end', values=(
+            sub_assembly_id, part_number, desc, qty, ref_des = sub_assembly_fields(sub)
+            if debug:
+                log.debug("Sub-assembly %d: %s - sub_assembly_id: %s",
+                          idx, part_number, sub_assembly_id)
+            append((f"s:{sub_assembly_id}", (
                 'Sub-Assembly',
-                sub['part_number'],
+                part_number,
                 'Assembly',
-                sub['description'],
-                sub['quantity'],
-                sub['reference_designators'],
+                desc,
+                qty,
+                ref_des,
                 '',
                 ''
-            ))
-            # Store metadata in dictionary
-            self.bom_item_metadata[item_id] = ('subassembly', sub['sub_assembly_id'])
-        
-        print(f"DEBUG: Total items in tree: {len(self.bom_tree.get_children())}")
+            ), ()))
+        
+        # Reloading the product already shown, after an add or delete, keeps
+        # the user's place in the list instead of jumping back to the top
+        same_product = self._bom_shown_product_id == self.current_bom_product_id
+        self._bom_shown_product_id = self.current_bom_product_id
+        self.bom_tree_pages.set_rows(rows, keep_position=same_product)
+        log.debug("Total items in tree: %d", len(rows))
     
     def add_to_bom(self):
         """Add component to BOM"""
-        product_str = self.bom_product_var.get()
-        component_str = self.bom_comp_var.get()
+        if self._import_in_progress():
+            return
         
-        if not product_str or not component_str:
+        product = self._selected_product(self.bom_product_combo, self._bom_product_ids)
+        index = self.bom_comp_combo.current()
+        component_id = self._bom_component_ids[index] if index >= 0 else None
+        
+        if not product or not component_id:
             messagebox.showerror("Error", "Please select product and component")
             return
         
@@ -992,47 +2413,30 @@ class BOMManagerGUI:
             messagebox.showerror("Error", "Invalid quantity")
             return
         
-        part_number = product_str.split(' - ')[0]
-        product = self.db.get_product(part_number)
-        
-        # Extract component info
-        mpn = component_str.split(' (')[0]
-        mfg = component_str.split('(')[1].rstrip(')')
-        
-        self.db.cursor.execute("""
-            SELECT component_id FROM components 
-            WHERE mfg_part_number = ? AND manufacturer = ?
-        """, (mpn, mfg))
-        component = self.db.cursor.fetchone()
-        
-        if product and component:
-            # Check for duplicate
-            self.db.cursor.execute("""
-                SELECT entry_id FROM bom_entries 
-                WHERE product_id = ? AND component_id = ?
-            """, (product['product_id'], component['component_id']))
-            
-            if self.db.cursor.fetchone():
-                messagebox.showerror("Duplicate Entry", 
-                    f"Component {mpn} ({mfg}) is already in this BOM.\n\n"
-                    "To change quantity or reference designators, delete the existing entry first.")
-                return
-            
-            ref_des = self.bom_comp_ref_entry.get().strip()
-            self.db.add_bom_entry(product['product_id'], component['component_id'], 
-                                 qty, ref_des)
-            messagebox.showinfo("Success", "Component added to BOM")
-            self.bom_comp_qty_entry.delete(0, tk.END)
-            self.bom_comp_qty_entry.insert(0, "1")
-            self.bom_comp_ref_entry.delete(0, tk.END)
-            self.load_bom()
+        # The insert is skipped, returning None, if the component is already listed
+        ref_des = self.bom_comp_ref_entry.get().strip()
+        if self.db.add_bom_entry_if_new(product['product_id'], component_id,
+                                        qty, ref_des) is None:
+            messagebox.showerror("Duplicate Entry", 
+                f"Component {self.bom_comp_var.get()} is already in this BOM.\n\n"
+                "To change quantity or reference designators, delete the existing entry first.")
+            return
+        
+        messagebox.showinfo("Success", "Component added to BOM")
+        self.bom_comp_qty_entry.delete(0, tk.END)
+        self.bom_comp_qty_entry.insert(0, "1")
+        self.bom_comp_ref_entry.delete(0, tk.END)
+        self.load_bom()
     
     def add_subassembly_to_bom(self):
         """Add sub-assembly to BOM"""
-        product_str = self.bom_product_var.get()
-        sub_str = self.bom_sub_var.get()
+        if self._import_in_progress():
+            return
+        
+        parent_product = self._selected_product(self.bom_product_combo, self._bom_product_ids)
+        child_product = self._selected_product(self.bom_sub_combo, self._bom_product_ids)
         
-        if not product_str or not sub_str:
+        if not parent_product or not child_product:
             messagebox.showerror("Error", "Please select parent product and sub-assembly")
             return
         
@@ -1042,59 +2446,47 @@ class BOMManagerGUI:
             messagebox.showerror("Error", "Invalid quantity")
             return
         
-        parent_pn = product_str.split(' - ')[0]
-        child_pn = sub_str.split(' - ')[0]
-        
-        if parent_pn == child_pn:
-            messagebox.showerror("Error", "Cannot add product to itself")
+        # Rejects the product itself and any sub-assembly that already
+        # contains the parent, which would make the BOM contain itself
+        if self.db.contains_product(child_product['product_id'], parent_product['product_id']):
+            messagebox.showerror("Error", "Cannot add a product to itself, directly or "
+                                 "through its sub-assemblies")
             return
         
-        parent_product = self.db.get_product(parent_pn)
-        child_product = self.db.get_product(child_pn)
+        # The insert is skipped, returning None, if the sub-assembly is already listed
+        ref_des = self.bom_sub_ref_entry.get().strip()
+        if self.db.add_sub_assembly(parent_product['product_id'],
+                                    child_product['product_id'], qty, ref_des) is None:
+            messagebox.showerror("Duplicate Entry", 
+                f"Sub-assembly {child_product['part_number']} is already in this BOM.\n\n"
+                "To change quantity or reference designators, delete the existing entry first.")
+            return
         
-        if parent_product and child_product:
-            # Check for duplicate
-            self.db.cursor.execute("""
-                SELECT sub_assembly_id FROM sub_assemblies 
-                WHERE parent_product_id = ? AND child_product_id = ?
-            """, (parent_product['product_id'], child_product['product_id']))
-            
-            if self.db.cursor.fetchone():
-                messagebox.showerror("Duplicate Entry", 
-                    f"Sub-assembly {child_pn} is already in this BOM.\n\n"
-                    "To change quantity or reference designators, delete the existing entry first.")
-                return
-            
-            ref_des = self.bom_sub_ref_entry.get().strip()
-            self.db.add_sub_assembly(parent_product['product_id'], 
-                                    child_product['product_id'], qty, ref_des)
-            messagebox.showinfo("Success", "Sub-assembly added to BOM")
-            self.bom_sub_qty_entry.delete(0, tk.END)
-            self.bom_sub_qty_entry.insert(0, "1")
-            self.bom_sub_ref_entry.delete(0, tk.END)
-            self.load_bom()
+        messagebox.showinfo("Success", "Sub-assembly added to BOM")
+        self.bom_sub_qty_entry.delete(0, tk.END)
+        self.bom_sub_qty_entry.insert(0, "1")
+        self.bom_sub_ref_entry.delete(0, tk.END)
+        self.load_bom()
     
     def refresh_cost_products(self):
         """Refresh product list in cost tab"""
-        products = self.db.get_all_products()
-        product_list = [f"{p['part_number']} - {p['description']}" for p in products]
-        self.cost_product_combo['values'] = product_list
+        self.cost_product_combo['values'] = self._product_choices()
+        self._cost_product_ids = self._product_ids_cache
     
     def delete_bom_item(self):
         """Delete selected BOM item"""
+        if self._import_in_progress():
+            return
+        
         selected = self.bom_tree.selection()
         if not selected:
             messagebox.showwarning("No Selection", "Please select an item to delete")
             return
         
-        # Get the item's metadata from dictionary
+        # The item id carries its kind and database id
         item_id = selected[0]
-        
-        if item_id not in self.bom_item_metadata:
-            messagebox.showerror("Error", "Cannot find item metadata")
-            return
-        
-        item_type, db_id = self.bom_item_metadata[item_id]
+        item_type, _, db_id = item_id.partition(':')
+        db_id = int(db_id)
         
         # Get item info for confirmation
         values = self.bom_tree.item(item_id, 'values')
@@ -1107,9 +2499,9 @@ class BOMManagerGUI:
         
         # Delete from database
         success = False
-        if item_type == 'component':
+        if item_type == 'c':
             success = self.db.delete_bom_entry(db_id)
-        elif item_type == 'subassembly':
+        elif item_type == 's':
             success = self.db.delete_sub_assembly_entry(db_id)
         
         if success:
@@ -1120,16 +2512,19 @@ class BOMManagerGUI:
     
     def clear_entire_bom(self):
         """Clear all items from the current BOM"""
+        if self._import_in_progress():
+            return
+        
         if not hasattr(self, 'current_bom_product_id'):
             messagebox.showwarning("No Product", "Please select a product first")
             return
         
-        selected = self.bom_product_var.get()
-        if not selected:
+        product = self._selected_product(self.bom_product_combo, self._bom_product_ids)
+        if not product:
             messagebox.showwarning("No Product", "Please select a product first")
             return
         
-        part_number = selected.split(' - ')[0]
+        part_number = product['part_number']
         
         # Confirm deletion
         if not messagebox.askyesno("Confirm Clear BOM", 
@@ -1149,6 +2544,9 @@ class BOMManagerGUI:
     
     def cleanup_duplicates(self):
         """Clean up duplicate component sources"""
+        if self._import_in_progress():
+            return
+        
         if not messagebox.askyesno("Clean Up Duplicates", 
                                    "This will remove duplicate component sources (same component + distributor).\n\n"
                                    "The most recent entry for each duplicate will be kept.\n\n"
@@ -1167,8 +2565,8 @@ class BOMManagerGUI:
     
     def calculate_cost(self):
         """Calculate and display cost breakdown"""
-        selected = self.cost_product_var.get()
-        if not selected:
+        product = self._selected_product(self.cost_product_combo, self._cost_product_ids)
+        if not product:
             messagebox.showerror("Error", "Please select a product")
             return
         
@@ -1178,49 +2576,40 @@ class BOMManagerGUI:
             messagebox.showerror("Error", "Invalid quantity")
             return
         
-        part_number = selected.split(' - ')[0]
-        product = self.db.get_product(part_number)
-        
-        if not product:
-            return
-        
-        # Calculate cost
-        total_cost, breakdown = self.db.calculate_bom_cost(product['product_id'], qty)
+        # Calculate cost on the database worker, or reuse an unchanged result
+        self._submit_cached('cost', self._show_cost,
+                            BOMDatabase.calculate_bom_cost, product['product_id'], qty)
+    
+    def _show_cost(self, cost):
+        """Display a cost breakdown computed by the database worker"""
+        total_cost, breakdown = cost
         
         # Update display
         self.total_cost_label.config(text=f"${total_cost:.2f}")
         
-        # Clear tree
-        for item in self.cost_tree.get_children():
-            self.cost_tree.delete(item)
-        
-        # Add breakdown
-        for item in breakdown:
-            # Format differently for sub-assemblies vs components
-            if '[SUB-ASSEMBLY]' in item['item']:
-                # Sub-assemblies in bold (using tags)
-                self.cost_tree.insert('', 'end', values=(
-                    item['item'],
-                    f"{item['quantity']:.2f}",
-                    f"${item['unit_cost']:.4f}" if item['unit_cost'] > 0 else "Calculated",
-                    f"${item['total']:.2f}"
-                ), tags=('subassembly',))
-            else:
-                # Regular components
-                self.cost_tree.insert('', 'end', values=(
-                    item['item'],
-                    f"{item['quantity']:.2f}",
-                    f"${item['unit_cost']:.4f}",
-                    f"${item['total']:.2f}"
-                ))
-        
-        # Configure tags for better visibility
-        self.cost_tree.tag_configure('subassembly', background='#e8f4f8')
+        # Add breakdown; the paged tree formats only the rows it inserts
+        self._cost_breakdown = breakdown
+        self.cost_tree_pages.set_rows(breakdown)
+    
+    def _cost_row(self, idx, item):
+        """Format one cost breakdown item as a cost tree row"""
+        name = item['item']
+        unit_cost = item['unit_cost']
+        # Format differently for sub-assemblies vs components
+        if '[SUB-ASSEMBLY]' in name:
+            # Sub-assemblies are highlighted (using tags)
+            unit_cost_str = f"${unit_cost:.4f}" if unit_cost > 0 else "Calculated"
+            tags = ('subassembly',)
+        else:
+            unit_cost_str = f"${unit_cost:.4f}"
+            tags = ()
+        return (str(idx), (name, f"{item['quantity']:.2f}", unit_cost_str,
+                           f"${item['total']:.2f}"), tags)
     
     def export_flattened_bom(self):
         """Export flattened BOM to CSV"""
-        selected = self.cost_product_var.get()
-        if not selected:
+        product = self._selected_product(self.cost_product_combo, self._cost_product_ids)
+        if not product:
             messagebox.showerror("Error", "Please select a product")
             return
         
@@ -1230,47 +2619,29 @@ class BOMManagerGUI:
             messagebox.showerror("Error", "Invalid quantity")
             return
         
-        part_number = selected.split(' - ')[0]
-        product = self.db.get_product(part_number)
-        
-        if not product:
-            return
-        
         filename = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialfile=f"{part_number}_flattened_bom.csv"
+            filetypes=_EXPORT_FILETYPES,
+            initialfile=f"{product['part_number']}_flattened_bom.csv"
         )
         
         if not filename:
             return
         
-        flattened = self.db.get_flattened_bom(product['product_id'], qty)
-        
-        with open(filename, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Mfg Part Number', 'Manufacturer', 'Description', 'Category',
-                           'Total Quantity', 'Unit Cost', 'Total Cost', 'Distributor',
-                           'Distributor Part Number'])
-            
-            for item in flattened:
-                total_cost = float(item['unit_cost']) * item['quantity'] if item['unit_cost'] else 0
-                writer.writerow([
-                    item['mfg_part_number'],
-                    item['manufacturer'],
-                    item['description'],
-                    item['category'],
-                    item['quantity'],
-                    item['unit_cost'] or '',
-                    f"{total_cost:.2f}" if item['unit_cost'] else '',
-                    item['distributor'] or '',
-                    item['distributor_part_number'] or ''
-                ])
-        
+        # Query and write the file on the database worker
+        self.db_worker.submit(('export', filename), self._flattened_bom_exported,
+                              BOMDatabase.write_flattened_bom_csv, product['product_id'],
+                              qty, filename)
+    
+    def _flattened_bom_exported(self, filename):
+        """Confirm a flattened BOM export written by the database worker"""
         messagebox.showinfo("Success", f"Flattened BOM exported to {filename}")
     
     def import_bom_csv(self):
         """Import BOM from CSV file"""
+        if self._import_in_progress():
+            return
+        
         filename = filedialog.askopenfilename(
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
@@ -1279,226 +2650,185 @@ class BOMManagerGUI:
             return
         
         # Show dialog to select product
-        products = self.db.get_all_products()
+        products = self._products()
         if not products:
             messagebox.showerror("Error", "No products exist. Create a product first.")
             return
         
-        # Create product selection dialog
+        product = self._ask_import_product()
+        if not product:
+            return
+        
+        # Read, parse and write the CSV on the database worker, which posts
+        # its progress back to the activity bar
+        progress = functools.partial(self.db_worker.post, self._show_import_progress)
+        self._imports_running += 1
+        self.db_worker.submit(('import', filename),
+                              lambda result: self._finish_import(product, result),
+                              self._import_on_worker, filename, product['product_id'], progress,
+                              errback=self._import_failed)
+    
+    @staticmethod
+    def _import_on_worker(db, filename, product_id, progress):
+        """Import a CSV from a worker thread through a writable connection of its own"""
+        writer = BOMDatabase(db.db_path, db.fast, create_schema=False)
+        try:
+            return writer.import_bom_csv(product_id, filename, progress=progress)
+        finally:
+            writer.close()
+    
+    def _import_in_progress(self):
+        """Warn that edits must wait for a running import, returning whether one is running"""
+        # The import's connection holds the write lock until it finishes, so
+        # a write through self.db would stall the GUI and then fail
+        if self._imports_running:
+            messagebox.showwarning("Import in Progress",
+                                   "Please wait for the CSV import to finish before making changes.")
+            return True
+        return False
+    
+    def _show_import_progress(self, done, total):
+        """Show how far the running import has read through its file"""
+        self.busy_bar.stop()
+        self.busy_bar.configure(mode='determinate', maximum=total, value=done)
+    
+    def _ask_import_product(self):
+        """Ask which product to import into, returning it or None if cancelled"""
+        # The dialog is built on first use, then hidden and shown again
+        # for later imports
+        if self._import_dialog is None:
+            self._build_import_dialog()
+        else:
+            self._import_dialog.deiconify()
+        dialog = self._import_dialog
+        
+        self._import_product_combo['values'] = self._product_choices()
+        self._import_product_ids = self._product_ids_cache
+        self._import_product_var.set('')
+        self._import_choice = None
+        
+        dialog.grab_set()
+        dialog.wait_variable(self._import_done)
+        dialog.grab_release()
+        dialog.withdraw()
+        return self._import_choice
+    
+    def _build_import_dialog(self):
+        """Create the product selection dialog used by import_bom_csv"""
         dialog = tk.Toplevel(self.root)
         dialog.title("Select Product for Import")
         dialog.geometry("400x150")
         dialog.transient(self.root)
-        dialog.grab_set()
         
         ttk.Label(dialog, text="Select product to import BOM into:", 
                  font=('TkDefaultFont', 10)).pack(pady=10)
         
-        product_var = tk.StringVar()
-        product_combo = ttk.Combobox(dialog, textvariable=product_var,
-                                     width=50, state='readonly')
-        product_list = [f"{p['part_number']} - {p['description']}" for p in products]
-        product_combo['values'] = product_list
-        product_combo.pack(pady=10)
-        
-        selected_product = {'value': None}
+        self._import_product_var = tk.StringVar()
+        self._import_product_combo = ttk.Combobox(dialog, textvariable=self._import_product_var,
+                                                  width=50, state='readonly')
+        self._import_product_combo.pack(pady=10)
+        self._import_done = tk.BooleanVar()
         
         def on_ok():
-            if not product_var.get():
+            if not self._import_product_var.get():
                 messagebox.showerror("Error", "Please select a product")
                 return
-            selected_product['value'] = product_var.get()
-            dialog.destroy()
+            self._import_choice = self._selected_product(self._import_product_combo,
+                                                         self._import_product_ids)
+            self._import_done.set(True)
         
         def on_cancel():
-            dialog.destroy()
+            self._import_done.set(True)
         
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(pady=10)
         ttk.Button(btn_frame, text="OK", command=on_ok).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Cancel", command=on_cancel).pack(side=tk.LEFT, padx=5)
+        dialog.protocol("WM_DELETE_WINDOW", on_cancel)
         
-        dialog.wait_window()
+        self._import_dialog = dialog
+    
+    def _finish_import(self, product, result):
+        """Report an import written by the database worker and refresh the views"""
+        self._imports_running -= 1
+        imported_count, skipped_count, errors = result
+        # The rows went in through the worker's connection, not self.db
+        self.db.mark_changed()
+        
+        summary = (f"Successfully imported {imported_count} components.\n"
+                   f"Skipped {skipped_count} items.")
+        if errors:
+            self._show_import_errors(summary, errors)
+        else:
+            messagebox.showinfo("Import Complete", summary)
         
-        if not selected_product['value']:
-            return
+        # Refresh displays
+        self.refresh_components()
+        shown = self._selected_product(self.bom_product_combo, self._bom_product_ids)
+        if shown and shown['product_id'] == product['product_id']:
+            self.load_bom()
+    
+    def _show_import_errors(self, summary, errors):
+        """Report a finished import together with the rows it could not read"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Import Complete")
+        dialog.geometry("500x300")
+        dialog.transient(self.root)
         
-        part_number = selected_product['value'].split(' - ')[0]
-        product = self.db.get_product(part_number)
+        ttk.Label(dialog, text=summary, justify=tk.LEFT).pack(anchor=tk.W, padx=10, pady=10)
         
-        if not product:
-            return
+        frame = ttk.Frame(dialog)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL)
+        text = tk.Text(frame, height=10, wrap=tk.NONE, yscrollcommand=scrollbar.set)
+        scrollbar.configure(command=text.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        # Read and import CSV
-        try:
-            imported_count = 0
-            skipped_count = 0
-            
-            with open(filename, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                
-                # Check for required columns
-                required_cols = ['mfg_part_number', 'manufacturer', 'quantity']
-                if not all(col in reader.fieldnames for col in required_cols):
-                    messagebox.showerror("Error", 
-                        f"CSV must contain columns: {', '.join(required_cols)}\n"
-                        f"Found: {', '.join(reader.fieldnames)}")
-                    return
-                
-                for row in reader:
-                    try:
-                        # Skip empty rows
-                        if not row.get('mfg_part_number') or not row.get('manufacturer'):
-                            continue
-                        
-                        # Add or get component
-                        component_id = self.db.add_component(
-                            row['mfg_part_number'].strip(),
-                            row['manufacturer'].strip(),
-                            row.get('description', '').strip(),
-                            row.get('category', '').strip(),
-                            row.get('unit_of_measure', 'EA').strip()
-                        )
-                        
-                        if not component_id:
-                            skipped_count += 1
-                            continue
-                        
-                        # Add distributor source if provided
-                        if row.get('distributor') and row.get('unit_cost'):
-                            try:
-                                unit_cost = float(row['unit_cost'])
-                                self.db.add_component_source(
-                                    component_id,
-                                    row['distributor'].strip(),
-                                    row.get('distributor_part_number', '').strip(),
-                                    unit_cost,
-                                    int(row.get('minimum_order_qty', 1)),
-                                    int(row['lead_time_days']) if row.get('lead_time_days') else None
-                                )
-                            except (ValueError, KeyError):
-                                pass  # Skip invalid cost data
-                        
-                        # Add to BOM - check for duplicates first
-                        quantity = float(row['quantity'])
-                        ref_des = row.get('reference_designators', '').strip()
-                        notes = row.get('notes', '').strip()
-                        
-                        # Check if this component already exists in the BOM
-                        self.db.cursor.execute("""
-                            SELECT entry_id FROM bom_entries 
-                            WHERE product_id = ? AND component_id = ?
-                        """, (product['product_id'], component_id))
-                        
-                        existing = self.db.cursor.fetchone()
-                        
-                        if existing:
-                            # Component already in BOM, skip it
-                            skipped_count += 1
-                            print(f"Skipped duplicate: {row['mfg_part_number']} ({row['manufacturer']})")
-                            continue
-                        
-                        self.db.add_bom_entry(
-                            product['product_id'],
-                            component_id,
-                            quantity,
-                            ref_des,
-                            notes=notes
-                        )
-                        
-                        imported_count += 1
-                        
-                    except Exception as e:
-                        print(f"Error importing row: {row}, Error: {e}")
-                        skipped_count += 1
-                        continue
-            
-            messagebox.showinfo("Import Complete", 
-                f"Successfully imported {imported_count} components.\n"
-                f"Skipped {skipped_count} items.")
-            
-            # Refresh displays
-            self.refresh_components()
-            if self.bom_product_var.get() and part_number in self.bom_product_var.get():
-                self.load_bom()
-                
-        except Exception as e:
-            messagebox.showerror("Import Error", f"Error reading CSV file:\n{str(e)}")
+        text.insert(tk.END, '\n'.join(f"Line {line}: {message}" for line, message in errors))
+        if len(errors) == IMPORT_ERRORS_KEPT:
+            text.insert(tk.END, f"\n(at most {IMPORT_ERRORS_KEPT} invalid rows are listed)")
+        text.configure(state=tk.DISABLED)
+        
+        ttk.Button(dialog, text="OK", command=dialog.destroy).pack(pady=10)
+    
+    def _import_failed(self, error):
+        """Report an import that could not be read or written"""
+        self._imports_running -= 1
+        messagebox.showerror("Import Error", f"Error reading CSV file:\n{str(error)}")
     
     def export_bom_csv(self):
         """Export BOM to CSV file"""
-        selected = self.bom_product_var.get()
-        if not selected:
-            messagebox.showerror("Error", "Please select a product in the BOM Editor tab first")
-            return
-        
-        part_number = selected.split(' - ')[0]
-        product = self.db.get_product(part_number)
-        
+        product = self._selected_product(self.bom_product_combo, self._bom_product_ids)
         if not product:
+            messagebox.showerror("Error", "Please select a product in the BOM Editor tab first")
             return
         
         filename = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialfile=f"{part_number}_bom.csv"
+            filetypes=_EXPORT_FILETYPES,
+            initialfile=f"{product['part_number']}_bom.csv"
         )
         
         if not filename:
             return
         
-        components, sub_assemblies = self.db.get_product_bom(product['product_id'])
-        
-        with open(filename, 'w', newline='') as f:
-            writer = csv.writer(f)
-            # Header matches import format plus item_type to distinguish sub-assemblies
-            writer.writerow(['item_type', 'mfg_part_number', 'manufacturer', 'description', 'category',
-                           'quantity', 'reference_designators', 'distributor', 
-                           'distributor_part_number', 'unit_cost', 'minimum_order_qty', 
-                           'lead_time_days', 'notes'])
-            
-            for comp in components:
-                writer.writerow([
-                    'component',
-                    comp['mfg_part_number'],
-                    comp['manufacturer'],
-                    comp['description'],
-                    comp['category'],
-                    comp['quantity'],
-                    comp['reference_designators'],
-                    comp['distributor'] or '',
-                    comp['distributor_part_number'] or '',
-                    comp['unit_cost'] or '',
-                    comp['minimum_order_qty'] or '',
-                    comp['lead_time_days'] or '',
-                    comp['notes'] or ''
-                ])
-            
-            # Include sub-assemblies in export
-            for sub in sub_assemblies:
-                writer.writerow([
-                    'sub_assembly',
-                    sub['part_number'],
-                    'SUB-ASSEMBLY',
-                    sub['description'],
-                    'Assembly',
-                    sub['quantity'],
-                    sub['reference_designators'],
-                    '',
-                    '',
-                    '',
-                    '',
-                    '',
-                    sub['notes'] or ''
-                ])
-        
+        # Query and write the file on the database worker
+        self.db_worker.submit(('export', filename), self._bom_exported,
+                              BOMDatabase.write_bom_csv, product['product_id'], filename)
+    
+    def _bom_exported(self, filename):
+        """Confirm a BOM export written by the database worker"""
         messagebox.showinfo("Success", f"BOM exported to {filename}\n\nNote: Sub-assemblies are marked as 'sub_assembly' in the item_type column.")
 
 
 def main():
+    logging.basicConfig(level=logging.WARNING)
     root = tk.Tk()
     app = BOMManagerGUI(root)
     root.mainloop()
+    app.db_worker.close()
+    app.db.close()
 
 
 if __name__ == "__main__":
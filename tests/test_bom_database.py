@@ -0,0 +1,55 @@
+"""Tests for BOMDatabase"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bom_manager import BOMDatabase
+
+
+class DuplicateAddTests(unittest.TestCase):
+    """Adds that change nothing must not leave the write lock held"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'bom.db')
+        self.db = BOMDatabase(self.db_path)
+        self.parent_id = self.db.add_product('PCB-001', 'Board')
+        self.child_id = self.db.add_product('PSU-001', 'Supply')
+        self.component_id = self.db.add_component('RES-10K', 'Yageo')
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def assert_unlocked(self):
+        """Check that no transaction is open and another connection can write"""
+        self.assertFalse(self.db.conn.in_transaction)
+        other = sqlite3.connect(self.db_path, timeout=0)
+        try:
+            other.execute("BEGIN IMMEDIATE")
+            other.rollback()
+        finally:
+            other.close()
+
+    def test_duplicate_bom_entry(self):
+        self.assertIsNotNone(self.db.add_bom_entry_if_new(self.parent_id, self.component_id, 1))
+        self.assertIsNone(self.db.add_bom_entry_if_new(self.parent_id, self.component_id, 1))
+        self.assert_unlocked()
+
+    def test_duplicate_sub_assembly(self):
+        self.assertIsNotNone(self.db.add_sub_assembly(self.parent_id, self.child_id, 1))
+        self.assertIsNone(self.db.add_sub_assembly(self.parent_id, self.child_id, 1))
+        self.assert_unlocked()
+
+    def test_duplicate_product(self):
+        self.assertIsNone(self.db.add_product('PCB-001', 'Board'))
+        self.assert_unlocked()
+
+
+if __name__ == '__main__':
+    unittest.main()